@@ -1,13 +1,19 @@
 from django.contrib.admin import ModelAdmin, register
+from django.db.models.fields.json import KeyTextTransform
 from django.utils.html import format_html
 
 from .models import Feed, Link, Profile, RelativeScoring, SeenSubmission
 
 
 def linked_title(l: Link):
-    text = "[%s] %s" % (l.metadata["subreddit"], l.title) if l.reddit_id else l.title
+    if l.reddit_id:
+        text = "[%s] %s" % (l.subreddit, l.title)
+        url = "https://old.reddit.com%s" % l.metadata_permalink
+    else:
+        text = l.title
+        url = l.get_absolute_url()
     html = '<a href="{}" target="_blank">{}</a>'
-    return format_html(html, l.get_absolute_url(), text)
+    return format_html(html, url, text)
 
 
 def link_embed(l: Link):
@@ -32,10 +38,18 @@ class LinkAdmin(ModelAdmin):
     actions_on_top = False
     actions_on_bottom = False
 
+    def get_queryset(self, request):
+        return (
+            super()
+            .get_queryset(request)
+            .defer("metadata")
+            .annotate(metadata_permalink=KeyTextTransform("permalink", "metadata"))
+        )
+
 
 @register(RelativeScoring)
 class RelativeScoringAdmin(ModelAdmin):
-    list_display = ("id", "score", "last_updated")
+    list_display = ("id", "score", "last_updated", "failures")
     search_fields = ("id",)
 
 
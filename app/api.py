@@ -1,24 +1,44 @@
-from typing import Callable, Iterable, List
-import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Mapping, NamedTuple, Optional
 import logging
+import re
 
+from django.conf import settings
 from django.contrib.messages import get_messages
-from django.db.models import Subquery
-from django_filters.rest_framework import FilterSet, NumberFilter
+from django.db import close_old_connections
+from django.db.models import Exists, OuterRef
+from django_filters.rest_framework import FilterSet, NumberFilter, UUIDFilter
 from praw import Reddit
 from praw.models import Submission
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import CursorPagination
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticatedOrReadOnly
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.routers import DefaultRouter
-from rest_framework.serializers import ModelSerializer, CharField
+from rest_framework.serializers import (
+    BooleanField,
+    CharField,
+    DateTimeField,
+    IntegerField,
+    JSONField,
+    ModelSerializer,
+    Serializer,
+)
 from rest_framework.viewsets import ReadOnlyModelViewSet, ViewSet
 
-from .dao import SeenSubmissionDao
-from .data import AppDetails, Location, LocationFeed, Locations, SubmissionResults
-from .models import Feed, FeedType, Link, SeenSubmission
+from .cache import CacheEntry, get_locations_key, listing_cache, locations_cache
+from .dao import LinkDao, SeenSubmissionDao
+from .data import (
+    AppDetails,
+    Location,
+    LocationFeed,
+    Locations,
+    Submission as SubmissionData,
+    SubmissionResults,
+)
+from .models import Feed, FeedType, Link, Profile, SeenSubmission
 from .reddit import (
     get_multis,
     get_subreddits,
@@ -26,6 +46,9 @@ from .reddit import (
     use_oauth_reddit,
     get_submissions,
 )
+from .seen import seen_buffer
+from .tokens import get_profile_tokens
+from .utils import conditional_response, hash_json, to_obj
 
 
 def get_multi_feeds() -> Iterable[LocationFeed]:
@@ -43,7 +66,7 @@ class AppDetailsViewSet(ViewSet):
     def list(self, request: Request):
         if request.user.is_authenticated:
             feeds = list(get_multi_feeds())
-            reddit_users = sorted(json.loads(request.user.profile.enc_tokens).keys())
+            reddit_users = sorted(get_profile_tokens(request.user.profile).keys())
         else:
             feeds = []
             reddit_users = []
@@ -58,6 +81,23 @@ class AppDetailsViewSet(ViewSet):
         return Response()
 
 
+def locations_response(request: Request, entry: CacheEntry) -> Response:
+    return conditional_response(request, entry.etag, lambda: Response(entry.value))
+
+
+def get_cached_locations(
+    request: Request, kind: str, get_locations: Callable[[Reddit], List[Location]]
+) -> CacheEntry:
+    profile = request.user.profile
+    username = request.query_params.get("user") or None
+
+    def load() -> Locations:
+        return Locations(list(use_oauth_reddit(profile, username, get_locations)))
+
+    key = get_locations_key(kind, profile.user_id, username)
+    return locations_cache.get_entry(key, load)
+
+
 # pylint: disable=no-self-use
 class MeViewSet(ViewSet):
     def list(self, request: Request):
@@ -65,29 +105,39 @@ class MeViewSet(ViewSet):
 
     @action(detail=False)
     def multis(self, request):
-        username = request.query_params.get("user")
-        multis = list(use_oauth_reddit(request.user.profile, username, get_multis))
-        return Response(Locations(multis))
+        entry = get_cached_locations(request, "multis", get_multis)
+        return locations_response(request, entry)
 
     @action(detail=False)
     def subreddits(self, request):
-        username = request.query_params.get("user")
-        subreddits = list(
-            use_oauth_reddit(request.user.profile, username, get_subreddits)
-        )
-        return Response(Locations(subreddits))
+        entry = get_cached_locations(request, "subreddits", get_subreddits)
+        return locations_response(request, entry)
 
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(locations_cache.get_stats())
+
+
+prefetch_pool = ThreadPoolExecutor(max_workers=settings.UNSEEN_PREFETCH_WORKERS)
 
 ALLOWED_SORT = set(("hot", "top", "new", "rising", "controversial"))
 ALLOWED_TIME = set(("all", "year", "month", "day", "hour"))
 
 
-def get_submissions_listing(request: Request) -> Callable[[Reddit], List[Submission]]:
-    page_path = request.query_params.get("page_path") or ""
-    limit = request.query_params.get("limit") or "20"
-    after = request.query_params.get("after")
-    sort = request.query_params.get("sort")
-    time = request.query_params.get("t")
+class ListingParams(NamedTuple):
+    subreddit: Optional[str]
+    multi_owner: Optional[str]
+    multi_name: Optional[str]
+    sort: str
+    time: Optional[str]
+    limit: int
+
+
+def parse_listing_params(query_params: Mapping[str, str]) -> ListingParams:
+    page_path = query_params.get("page_path") or ""
+    limit = query_params.get("limit") or "20"
+    sort = query_params.get("sort")
+    time = query_params.get("t")
 
     subreddit = None
     multi_owner = None
@@ -104,25 +154,107 @@ def get_submissions_listing(request: Request) -> Callable[[Reddit], List[Submiss
     if time:
         time = time if time in ALLOWED_TIME else "all"
 
+    return ListingParams(subreddit, multi_owner, multi_name, sort, time, int(limit))
+
+
+def parse_bool(value: Optional[str]) -> bool:
+    return value in BooleanField.TRUE_VALUES
+
+
+def get_submissions_listing(
+    query_params: Mapping[str, str], after: Optional[str]
+) -> Callable[[Reddit], List[Submission]]:
+    listing_params = parse_listing_params(query_params)
+
     params = {}
     if after:
         params["after"] = f"t3_{after}"
 
     def get_results(reddit: Reddit) -> List[Submission]:
         def get_feed():
-            if subreddit:
-                return reddit.subreddit(subreddit)
-            if multi_owner and multi_name:
-                return reddit.multireddit(multi_owner, multi_name)
+            if listing_params.subreddit:
+                return reddit.subreddit(listing_params.subreddit)
+            if listing_params.multi_owner and listing_params.multi_name:
+                return reddit.multireddit(
+                    listing_params.multi_owner, listing_params.multi_name
+                )
             return reddit.front
 
-        listing = getattr(get_feed(), sort)
-        args = (time,) if time else ()
-        return list(listing(*args, limit=int(limit), params=params))
+        listing = getattr(get_feed(), listing_params.sort)
+        args = (listing_params.time,) if listing_params.time else ()
+        return list(listing(*args, limit=listing_params.limit, params=params))
 
     return get_results
 
 
+def get_listing_cache_key(
+    query_params: Mapping[str, str], user_id: Optional[int], after: Optional[str]
+) -> str:
+    page_path = query_params.get("page_path") or ""
+    user = None
+    if user_id is not None:
+        user = [user_id, query_params.get("user")]
+    key = [page_path, query_params.get("sort"), query_params.get("t"), after]
+    return hash_json(key + [query_params.get("limit"), user])
+
+
+def get_listing_page(
+    query_params: Mapping[str, str], profile: Optional[Profile], after: Optional[str]
+) -> List[SubmissionData]:
+    username = query_params.get("user")
+    get_results = get_submissions_listing(query_params, after)
+
+    def load() -> List[SubmissionData]:
+        results = (
+            use_oauth_reddit(profile, username, get_results)
+            if profile is not None
+            else use_anon_reddit(get_results)
+        )
+        return list(get_submissions(results))
+
+    user_id = profile.user_id if profile is not None else None
+    key = get_listing_cache_key(query_params, user_id, after)
+    timeout = settings.LISTING_CACHE_TTL.total_seconds()
+    return listing_cache.get_or_load(key, load, timeout)
+
+
+def get_next_after(page: List[SubmissionData]) -> Optional[str]:
+    return page[-1].id if page else None
+
+
+def get_unseen_listing_page(
+    query_params: Mapping[str, str], profile: Profile
+) -> SubmissionResults:
+    limit = int(query_params.get("limit") or "20")
+    after = query_params.get("after")
+    unseen: List[SubmissionData] = []
+    for _ in range(settings.UNSEEN_MAX_PAGES):
+        page = get_listing_page(query_params, profile, after)
+        ids = [s.id for s in page]
+        seen = set(SeenSubmissionDao.get_seen_ids(profile.user_id, ids))
+        unseen.extend(s for s in page if s.id not in seen)
+        after = get_next_after(page)
+        if len(unseen) >= limit or len(page) < limit:
+            break
+
+    if len(unseen) > limit:
+        after = unseen[limit - 1].id
+    if after:
+        prefetch_pool.submit(prefetch_listing_page, query_params, profile, after)
+    return SubmissionResults(unseen[:limit], after)
+
+
+def prefetch_listing_page(
+    query_params: Mapping[str, str], profile: Profile, after: str
+) -> None:
+    try:
+        get_listing_page(query_params, profile, after)
+    except Exception:
+        logging.exception("Error prefetching listing page")
+    finally:
+        close_old_connections()
+
+
 def get_submissions_by_id(reddit_ids: str) -> Callable[[Reddit], List[Submission]]:
     def get_results(reddit: Reddit) -> List[Submission]:
         fullnames = (f"t3_{id}" for id in reddit_ids.split(","))
@@ -131,6 +263,24 @@ def get_submissions_by_id(reddit_ids: str) -> Callable[[Reddit], List[Submission
     return get_results
 
 
+SEEN_ID_PATTERN = re.compile(r"[0-9a-z]{1,6}")
+
+
+def parse_seen_ids(data: Mapping) -> List[str]:
+    ids = data.get("ids") or []
+    if not isinstance(ids, list):
+        raise ValidationError({"ids": "Expected a list of submission ids."})
+    valid = [i for i in ids if isinstance(i, str) and SEEN_ID_PATTERN.fullmatch(i)]
+    if len(valid) < len(ids):
+        logging.warning("Ignoring %d invalid seen ids", len(ids) - len(valid))
+    return valid
+
+
+def location_response(request: Request, location: Location) -> Response:
+    etag = hash_json(to_obj(location))
+    return conditional_response(request, etag, lambda: Response(location))
+
+
 # pylint: disable=no-self-use
 class SubmissionViewSet(ViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
@@ -139,19 +289,26 @@ class SubmissionViewSet(ViewSet):
         username = request.query_params.get("user")
         reddit_ids = request.query_params.get("reddit_ids")
 
-        get_results = (
-            get_submissions_by_id(reddit_ids)
-            if reddit_ids
-            else get_submissions_listing(request)
-        )
+        if reddit_ids:
+            get_results = get_submissions_by_id(reddit_ids)
+            results = (
+                use_oauth_reddit(request.user.profile, username, get_results)
+                if request.user.is_authenticated
+                else use_anon_reddit(get_results)
+            )
+            return Response(SubmissionResults(list(get_submissions(results))))
 
-        results = (
-            use_oauth_reddit(request.user.profile, username, get_results)
-            if request.user.is_authenticated
-            else use_anon_reddit(get_results)
-        )
+        query_params = request.query_params.dict()
+        profile = request.user.profile if request.user.is_authenticated else None
+        if parse_bool(query_params.get("unseen")) and profile is not None:
+            return Response(get_unseen_listing_page(query_params, profile))
 
-        return Response(SubmissionResults(list(get_submissions(results))))
+        page = get_listing_page(query_params, profile, query_params.get("after"))
+        return Response(SubmissionResults(page, get_next_after(page)))
+
+    @action(detail=False, permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(listing_cache.get_stats())
 
     @action(detail=False, methods=["get"])
     def get_display_name(self, request):
@@ -159,7 +316,7 @@ class SubmissionViewSet(ViewSet):
         path_parts = page_path.split("/")
 
         if len(path_parts) == 2 and path_parts[0] == "r":
-            return Response(Location(page_path, path_parts[1]))
+            return location_response(request, Location(page_path, path_parts[1]))
 
         if len(path_parts) == 4 and path_parts[0] == "user" and path_parts[2] == "m":
             username = request.query_params.get("user")
@@ -172,35 +329,34 @@ class SubmissionViewSet(ViewSet):
                 if request.user.is_authenticated
                 else use_anon_reddit(get_name)
             )
-            return Response(Location(page_path, display_name))
+            return location_response(request, Location(page_path, display_name))
 
-        return Response(Location("", "Home"))
+        return location_response(request, Location("", "Home"))
 
     @action(detail=False, methods=["put"])
     def mark_seen(self, request):
-        ids = request.data.get("ids") or []
+        ids = parse_seen_ids(request.data)
+        if settings.SEEN_WRITE_BEHIND:
+            if not seen_buffer.add(request.user.id, ids):
+                return Response(status=503)
+            return Response(status=202)
         SeenSubmissionDao.mark_seen(request.user.id, ids)
         return Response()
 
 
-class LinkSerializer(ModelSerializer):
+# pylint: disable=abstract-method
+class LinkSerializer(Serializer):
     id = CharField(source="reddit_id", read_only=True)
-
-    class Meta:
-        model = Link
-        fields = (
-            "id",
-            "title",
-            "posted_at",
-            "subreddit",
-            "score",
-            "url",
-            "permalink",
-            "num_comments",
-            "is_read",
-            "is_saved",
-            "embed",
-        )
+    title = CharField(read_only=True)
+    posted_at = DateTimeField(read_only=True)
+    subreddit = CharField(read_only=True)
+    score = IntegerField(read_only=True)
+    url = CharField(read_only=True)
+    permalink = CharField(read_only=True)
+    num_comments = IntegerField(read_only=True)
+    is_read = BooleanField(read_only=True)
+    is_saved = BooleanField(read_only=True)
+    embed = JSONField(source="embed_data", read_only=True)
 
 
 class FeedSerializer(ModelSerializer):
@@ -210,12 +366,19 @@ class FeedSerializer(ModelSerializer):
 
 
 class LinkFilterSet(FilterSet):
+    feeds = UUIDFilter(method="filter_feeds")
     min_score = NumberFilter(field_name="score", lookup_expr="gte")
 
     class Meta:
         model = Link
         fields = ["feeds", "min_score"]
 
+    def filter_feeds(self, queryset, name, value):
+        feed_links = Link.feeds.through.objects.filter(
+            link_id=OuterRef("pk"), feed_id=value
+        )
+        return queryset.filter(Exists(feed_links))
+
 
 class LinkPagination(CursorPagination):
     page_size = 100
@@ -232,8 +395,28 @@ class LinkViewSet(ReadOnlyModelViewSet):
 
     def get_queryset(self):
         links = Link.objects.exclude(reddit_id=None)
-        seen = SeenSubmission.objects.filter(user=self.request.user)
-        return links.exclude(reddit_id__in=Subquery(seen.values("submission_id")))
+        if settings.SEEN_SUBMISSION_STORE != "bitmap":
+            seen = SeenSubmission.objects.filter(
+                user=self.request.user, submission_id=OuterRef("reddit_id")
+            )
+            links = links.filter(~Exists(seen))
+        return LinkDao.project(links)
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is None:
+            return page
+        if settings.SEEN_SUBMISSION_STORE == "bitmap":
+            ids = [l["reddit_id"] for l in page]
+            seen = set(SeenSubmissionDao.get_seen_ids(self.request.user.id, ids))
+            page = [l for l in page if l["reddit_id"] not in seen]
+        LinkDao.fill_stale_embeds(page)
+        return page
+
+    def get_object(self):
+        link = super().get_object()
+        LinkDao.fill_stale_embeds([link])
+        return link
 
     @action(detail=False, methods=["put"])
     def mark_read(self, request):
@@ -246,6 +429,18 @@ class FeedViewSet(ReadOnlyModelViewSet):
     queryset = Feed.objects.all()
     serializer_class = FeedSerializer
 
+    def list(self, request, *args, **kwargs):
+        feeds = self.filter_queryset(self.get_queryset()).order_by("id")
+        rows = feeds.values_list("id", "feed_type", "metadata")
+        etag = hash_json(
+            [request.get_full_path(), [[str(id), t, m] for id, t, m in rows]]
+        )
+        return conditional_response(
+            request,
+            etag,
+            lambda: super(FeedViewSet, self).list(request, *args, **kwargs),
+        )
+
 
 router = DefaultRouter()
 router.register("app", AppDetailsViewSet, "App")
@@ -0,0 +1,203 @@
+from functools import wraps
+from typing import Any, List, Optional
+
+from asgiref.sync import sync_to_async
+from asyncpraw import Reddit
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotAllowed
+from django.urls import path
+from django.utils.log import log_response
+from rest_framework.exceptions import NotAuthenticated
+
+from .api import (
+    get_listing_cache_key,
+    get_next_after,
+    parse_bool,
+    parse_listing_params,
+)
+from .async_reddit import get_multis, get_subreddits, use_anon_reddit, use_oauth_reddit
+from .cache import CacheEntry, get_locations_key, listing_cache, locations_cache
+from .dao import SeenSubmissionDao
+from .data import Location, Locations, Submission, SubmissionResults
+from .models import Profile
+from .reddit import get_submissions
+from .utils import conditional_response, dump_json, hash_json, to_obj
+
+
+@sync_to_async
+def get_profile(request: HttpRequest) -> Optional[Profile]:
+    return request.user.profile if request.user.is_authenticated else None
+
+
+def json_response(data: Any, status: int = 200) -> HttpResponse:
+    return HttpResponse(dump_json(data), content_type="application/json", status=status)
+
+
+def not_authenticated() -> HttpResponse:
+    return json_response({"detail": NotAuthenticated.default_detail}, 403)
+
+
+# django.views.decorators.http.require_GET hides coroutine views from Django 3.1
+def require_get(view):
+    @wraps(view)
+    async def inner(request: HttpRequest, *args, **kwargs):
+        if request.method != "GET":
+            response = HttpResponseNotAllowed(["GET"])
+            log_response(
+                "Method Not Allowed (%s): %s",
+                request.method,
+                request.path,
+                response=response,
+                request=request,
+            )
+            return response
+        return await view(request, *args, **kwargs)
+
+    return inner
+
+
+async def use_reddit(request: HttpRequest, profile: Optional[Profile], func):
+    username = request.GET.get("user")
+    if profile is not None:
+        return await use_oauth_reddit(profile, username, func)
+    return await use_anon_reddit(func)
+
+
+async def get_listing_page(
+    request: HttpRequest, profile: Optional[Profile], after: Optional[str]
+) -> List[Submission]:
+    listing_params = parse_listing_params(request.GET)
+    params = {"after": f"t3_{after}"} if after else {}
+
+    async def get_results(reddit: Reddit):
+        if listing_params.subreddit:
+            feed = await reddit.subreddit(listing_params.subreddit)
+        elif listing_params.multi_owner and listing_params.multi_name:
+            feed = await reddit.multireddit(
+                listing_params.multi_owner, listing_params.multi_name
+            )
+        else:
+            feed = reddit.front
+
+        listing = getattr(feed, listing_params.sort)
+        args = (listing_params.time,) if listing_params.time else ()
+        return [
+            s async for s in listing(*args, limit=listing_params.limit, params=params)
+        ]
+
+    async def load() -> List[Submission]:
+        return list(get_submissions(await use_reddit(request, profile, get_results)))
+
+    user_id = profile.user_id if profile is not None else None
+    key = get_listing_cache_key(request.GET, user_id, after)
+    timeout = settings.LISTING_CACHE_TTL.total_seconds()
+    return await listing_cache.aget_or_load(key, load, timeout)
+
+
+async def get_unseen_listing_page(
+    request: HttpRequest, profile: Profile
+) -> SubmissionResults:
+    limit = int(request.GET.get("limit") or "20")
+    after = request.GET.get("after")
+    get_seen_ids = sync_to_async(SeenSubmissionDao.get_seen_ids)
+    unseen: List[Submission] = []
+    for _ in range(settings.UNSEEN_MAX_PAGES):
+        page = await get_listing_page(request, profile, after)
+        seen = set(await get_seen_ids(profile.user_id, [s.id for s in page]))
+        unseen.extend(s for s in page if s.id not in seen)
+        after = get_next_after(page)
+        if len(unseen) >= limit or len(page) < limit:
+            break
+
+    if len(unseen) > limit:
+        after = unseen[limit - 1].id
+    return SubmissionResults(unseen[:limit], after)
+
+
+@require_get
+async def submissions(request: HttpRequest):
+    profile = await get_profile(request)
+    reddit_ids = request.GET.get("reddit_ids")
+
+    if reddit_ids:
+
+        async def get_results(reddit: Reddit):
+            fullnames = [f"t3_{id}" for id in reddit_ids.split(",")]
+            return [s async for s in reddit.info(fullnames)]
+
+        results = await use_reddit(request, profile, get_results)
+        return json_response(SubmissionResults(list(get_submissions(results))))
+
+    if parse_bool(request.GET.get("unseen")) and profile is not None:
+        return json_response(await get_unseen_listing_page(request, profile))
+
+    page = await get_listing_page(request, profile, request.GET.get("after"))
+    return json_response(SubmissionResults(page, get_next_after(page)))
+
+
+def location_response(request: HttpRequest, location: Location) -> HttpResponse:
+    etag = hash_json(to_obj(location))
+    return conditional_response(request, etag, lambda: json_response(location))
+
+
+@require_get
+async def get_display_name(request: HttpRequest):
+    page_path = request.GET.get("page_path") or ""
+    path_parts = page_path.split("/")
+
+    if len(path_parts) == 2 and path_parts[0] == "r":
+        return location_response(request, Location(page_path, path_parts[1]))
+
+    if len(path_parts) == 4 and path_parts[0] == "user" and path_parts[2] == "m":
+        profile = await get_profile(request)
+
+        async def get_name(reddit: Reddit) -> str:
+            multi = await reddit.multireddit(path_parts[1], path_parts[3], fetch=True)
+            return multi.display_name
+
+        display_name = await use_reddit(request, profile, get_name)
+        return location_response(request, Location(page_path, display_name))
+
+    return location_response(request, Location("", "Home"))
+
+
+async def get_cached_locations(
+    request: HttpRequest, profile: Profile, kind: str, get_locations
+) -> CacheEntry:
+    username = request.GET.get("user") or None
+
+    async def load() -> Locations:
+        return Locations(await use_oauth_reddit(profile, username, get_locations))
+
+    key = get_locations_key(kind, profile.user_id, username)
+    return await locations_cache.aget_entry(key, load)
+
+
+def locations_response(request: HttpRequest, entry: CacheEntry) -> HttpResponse:
+    return conditional_response(request, entry.etag, lambda: json_response(entry.value))
+
+
+@require_get
+async def multis(request: HttpRequest):
+    profile = await get_profile(request)
+    if profile is None:
+        return not_authenticated()
+    entry = await get_cached_locations(request, profile, "multis", get_multis)
+    return locations_response(request, entry)
+
+
+@require_get
+async def subreddits(request: HttpRequest):
+    profile = await get_profile(request)
+    if profile is None:
+        return not_authenticated()
+    entry = await get_cached_locations(request, profile, "subreddits", get_subreddits)
+    return locations_response(request, entry)
+
+
+urlpatterns = [
+    path("submissions/", submissions),
+    path("submissions/get_display_name/", get_display_name),
+    path("me/multis/", multis),
+    path("me/subreddits/", subreddits),
+]
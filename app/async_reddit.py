@@ -0,0 +1,105 @@
+from asgiref.sync import sync_to_async
+from asyncpraw import Reddit
+from django.conf import settings
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from .dao import ProfileDao
+from .data import Location, Token
+from .models import Profile
+from .pool import ClientPool
+from .tokens import (
+    apply_token,
+    get_profile_tokens,
+    get_token_key,
+    is_expiring,
+    read_token,
+    token_cache,
+)
+from .utils import spawn
+
+T = TypeVar("T")
+
+
+def close_reddit(reddit: Reddit) -> None:
+    spawn(reddit.close())
+
+
+oauth_clients: ClientPool[Reddit] = ClientPool(
+    settings.REDDIT_CLIENT_POOL_SIZE,
+    settings.REDDIT_CLIENT_IDLE_TIMEOUT.total_seconds(),
+    close_reddit,
+)
+anon_clients: ClientPool[Reddit] = ClientPool(
+    settings.REDDIT_CLIENT_POOL_SIZE,
+    settings.REDDIT_CLIENT_IDLE_TIMEOUT.total_seconds(),
+    close_reddit,
+)
+
+
+# pylint: disable=protected-access
+async def use_oauth_reddit(
+    profile: Profile, username: Optional[str], func: Callable[[Reddit], Awaitable[T]]
+) -> T:
+    tokens = await sync_to_async(get_profile_tokens)(profile)
+    user = username or sorted(tokens.keys())[0]
+    key = get_token_key(profile.user_id, user)
+    token = token_cache.get(key, tokens[user])
+
+    def create_reddit() -> Reddit:
+        return Reddit(
+            user_agent=settings.REDDIT_OAUTH_USER_AGENT,
+            client_id=settings.REDDIT_OAUTH_CLIENT_ID,
+            client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
+            refresh_token=token.token_secret,
+        )
+
+    async def save_token(new_token: Token) -> None:
+        token_cache.put(key, new_token)
+        await sync_to_async(ProfileDao.write_token)(profile.user_id, user, new_token)
+
+    with oauth_clients.checkout(key, create_reddit) as reddit:
+        auth = reddit._core._authorizer
+        if is_expiring(token):
+            async with token_cache.async_refresh_lock(key):
+                token = token_cache.get(key, token)
+                if is_expiring(token):
+                    apply_token(auth, token)
+                    await auth.refresh()
+                    token = read_token(auth)
+                    await save_token(token)
+        apply_token(auth, token)
+        result = await func(reddit)
+        if auth.access_token != token.token:
+            await save_token(read_token(auth))
+    return result
+
+
+async def use_anon_reddit(func: Callable[[Reddit], Awaitable[T]]) -> T:
+    def create_reddit() -> Reddit:
+        return Reddit(
+            user_agent=settings.REDDIT_OAUTH_USER_AGENT,
+            client_id=settings.REDDIT_OAUTH_CLIENT_ID,
+            client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
+        )
+
+    with anon_clients.checkout(None, create_reddit) as reddit:
+        return await func(reddit)
+
+
+async def get_multis(reddit: Reddit) -> List[Location]:
+    me = await reddit.user.me()
+    locs = (
+        Location(f"user/{m.owner}/m/{m.name}", m.display_name)
+        for m in await me.multireddits()
+    )
+
+    return sorted(locs, key=lambda l: str.lower(l.display_name))
+
+
+async def get_subreddits(reddit: Reddit) -> List[Location]:
+    locs = [
+        Location(f"r/{sr.display_name}", sr.display_name)
+        async for sr in reddit.user.subreddits()
+    ]
+
+    return sorted(locs, key=lambda l: str.lower(l.display_name))
@@ -7,7 +7,8 @@ UserModel = get_user_model()
 class ProfileAuthenticationBackend(AuthenticationBackend):
     def get_user(self, user_id):
         try:
-            user = UserModel.objects.select_related("profile").get(pk=user_id)
+            users = UserModel.objects.select_related("profile")
+            user = users.defer("profile__enc_tokens").get(pk=user_id)
         except UserModel.DoesNotExist:
             return None
         return user if self.user_can_authenticate(user) else None
\ No newline at end of file
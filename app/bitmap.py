@@ -0,0 +1,57 @@
+from array import array
+from bisect import bisect_left
+from sys import byteorder
+from typing import Iterable, Set, Tuple
+
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+BITMAP_BYTES = (1 << CHUNK_BITS) // 8
+ARRAY_MAX = BITMAP_BYTES // 2
+
+
+def split_id(value: int) -> Tuple[int, int]:
+    return value >> CHUNK_BITS, value & CHUNK_MASK
+
+
+def encode(values: Set[int]) -> bytes:
+    if len(values) >= ARRAY_MAX:
+        bitmap = bytearray(BITMAP_BYTES)
+        for value in values:
+            bitmap[value >> 3] |= 1 << (value & 7)
+        return bytes(bitmap)
+    sorted_values = array("H", sorted(values))
+    if byteorder == "big":
+        sorted_values.byteswap()
+    return sorted_values.tobytes()
+
+
+def decode(data: bytes) -> Set[int]:
+    if len(data) == BITMAP_BYTES:
+        return set(
+            (i << 3) | bit
+            for i, byte in enumerate(data)
+            if byte
+            for bit in range(8)
+            if byte & (1 << bit)
+        )
+    return set(to_array(data))
+
+
+def contains(data: bytes, value: int) -> bool:
+    if len(data) == BITMAP_BYTES:
+        return bool(data[value >> 3] & (1 << (value & 7)))
+    values = to_array(data)
+    i = bisect_left(values, value)
+    return i < len(values) and values[i] == value
+
+
+def add_all(data: bytes, values: Iterable[int]) -> bytes:
+    return encode(decode(data) | set(values))
+
+
+def to_array(data: bytes) -> array:
+    values = array("H")
+    values.frombytes(data)
+    if byteorder == "big":
+        values.byteswap()
+    return values
@@ -0,0 +1,208 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+from time import time
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    TypeVar,
+)
+import asyncio
+import logging
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .utils import hash_json, spawn, to_obj
+
+T = TypeVar("T")
+
+
+class CoalescingCache:
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.lock = Lock()
+        self.loading: Dict[str, Future] = {}
+        self.aloading: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def get_or_load(self, key: str, load: Callable[[], T], timeout: float) -> T:
+        cache = caches[self.alias]
+        value = cache.get(key)
+        if value is not None:
+            self.count("hits")
+            return value
+
+        with self.lock:
+            future = self.loading.get(key)
+            is_loader = future is None
+            if is_loader:
+                future = self.loading[key] = Future()
+
+        if not is_loader:
+            self.count("coalesced")
+            return future.result()
+
+        self.count("misses")
+        try:
+            value = load()
+            cache.set(key, value, timeout)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.loading[key]
+
+    async def aget_or_load(
+        self, key: str, load: Callable[[], Awaitable[T]], timeout: float
+    ) -> T:
+        cache = caches[self.alias]
+        value = cache.get(key)
+        if value is not None:
+            self.count("hits")
+            return value
+
+        future = self.aloading.get(key)
+        if future is not None:
+            self.count("coalesced")
+            return await asyncio.shield(future)
+
+        self.count("misses")
+        future = self.aloading[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await load()
+            cache.set(key, value, timeout)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            del self.aloading[key]
+
+    def count(self, counter: str) -> None:
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_stats(self) -> Mapping[str, int]:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "loading": len(self.loading) + len(self.aloading),
+            }
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    etag: str
+    loaded_at: float
+
+
+def make_entry(value: Any) -> CacheEntry:
+    return CacheEntry(value, hash_json(to_obj(value)), time())
+
+
+refresh_pool = ThreadPoolExecutor(max_workers=settings.LOCATIONS_REFRESH_WORKERS)
+
+
+class RefreshingCache(CoalescingCache):
+    def __init__(self, alias: str, refresh_after: float, timeout: float):
+        super().__init__(alias)
+        self.refresh_after = refresh_after
+        self.timeout = timeout
+        self.refreshing: Set[str] = set()
+        self.refreshes = 0
+
+    def get_entry(self, key: str, load: Callable[[], Any]) -> CacheEntry:
+        entry = self.get_or_load(key, lambda: make_entry(load()), self.timeout)
+        if self.is_stale(entry) and self.start_refresh(key):
+            refresh_pool.submit(self.refresh, key, load)
+        return entry
+
+    async def aget_entry(
+        self, key: str, load: Callable[[], Awaitable[Any]]
+    ) -> CacheEntry:
+        async def load_entry() -> CacheEntry:
+            return make_entry(await load())
+
+        entry = await self.aget_or_load(key, load_entry, self.timeout)
+        if self.is_stale(entry) and self.start_refresh(key):
+            spawn(self.arefresh(key, load))
+        return entry
+
+    def is_stale(self, entry: CacheEntry) -> bool:
+        return time() - entry.loaded_at > self.refresh_after
+
+    def start_refresh(self, key: str) -> bool:
+        with self.lock:
+            if key in self.refreshing:
+                return False
+            self.refreshing.add(key)
+            self.refreshes += 1
+            return True
+
+    def refresh(self, key: str, load: Callable[[], Any]) -> None:
+        try:
+            caches[self.alias].set(key, make_entry(load()), self.timeout)
+        except Exception:
+            logging.exception("Error refreshing cache entry")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+            close_old_connections()
+
+    async def arefresh(self, key: str, load: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            caches[self.alias].set(key, make_entry(await load()), self.timeout)
+        except Exception:
+            logging.exception("Error refreshing cache entry")
+        finally:
+            with self.lock:
+                self.refreshing.discard(key)
+
+    def delete(self, key: str) -> None:
+        caches[self.alias].delete(key)
+
+    def get_stats(self) -> Mapping[str, int]:
+        stats = dict(super().get_stats())
+        with self.lock:
+            stats["refreshes"] = self.refreshes
+        return stats
+
+
+LOCATION_KINDS = ("multis", "subreddits")
+
+
+def get_locations_key(kind: str, user_id: int, username: Optional[str]) -> str:
+    return hash_json([kind, user_id, username])
+
+
+def invalidate_locations(user_id: int, username: str) -> None:
+    for kind in LOCATION_KINDS:
+        for user in (username, None):
+            locations_cache.delete(get_locations_key(kind, user_id, user))
+
+
+listing_cache = CoalescingCache("listings")
+locations_cache = RefreshingCache(
+    "locations",
+    settings.LOCATIONS_CACHE_REFRESH.total_seconds(),
+    settings.LOCATIONS_CACHE_TTL.total_seconds(),
+)
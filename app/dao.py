@@ -1,12 +1,30 @@
-from datetime import datetime
-from typing import Iterable
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple, Type
 import json
+import logging
+import uuid
 
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Model, Q, QuerySet, Sum
+from django.db.models.expressions import RawSQL
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from psycopg2.extras import execute_values
 
+from . import bitmap
 from .data import Token
-from .models import Profile, RelativeScoring, SeenSubmission
-from .utils import to_json
+from .embed import EMBED_VERSION, get_embed
+from .models import (
+    Feed,
+    HnItem,
+    Link,
+    LinkRawMetadata,
+    Profile,
+    RelativeScoring,
+    SeenChunk,
+    SeenSubmission,
+)
+from .utils import to_json, to_obj
 
 
 class ProfileDao:
@@ -21,26 +39,312 @@ class ProfileDao:
         )
         if not created:
             obj.enc_tokens = json.loads(obj.enc_tokens) | tokens
+            obj.version += 1
             obj.save()
 
 
+class LinkDao:
+    manager = Link.objects
+
+    @classmethod
+    @transaction.atomic
+    def upsert_reddit_links(
+        cls,
+        links: Iterable[Link],
+        feed: Feed,
+        raw_metadata: Optional[Mapping[str, Mapping]] = None,
+    ) -> None:
+        raw_metadata = raw_metadata or {}
+        by_reddit_id = {l.reddit_id: l for l in links}
+        existing = cls.manager.filter(reddit_id__in=by_reddit_id.keys()).only(
+            "id", "reddit_id", "subreddit", "score", "title", "metadata_hash"
+        )
+
+        updated = []
+        update_fields = set()
+        all_links = []
+        metadata_changed = []
+        for link in existing:
+            new = by_reddit_id[link.reddit_id]
+            changed = set()
+            if new.score != link.score:
+                link.score = new.score
+                changed.add("score")
+            if new.title != link.title:
+                link.title = new.title
+                changed.add("title")
+            if new.subreddit != link.subreddit:
+                link.subreddit = new.subreddit
+                changed.add("subreddit")
+            if new.metadata_hash != link.metadata_hash:
+                link.metadata = new.metadata
+                link.metadata_hash = new.metadata_hash
+                link.embed_data = new.embed_data
+                link.embed_version = new.embed_version
+                changed |= {"metadata", "metadata_hash", "embed_data", "embed_version"}
+                metadata_changed.append(link)
+            if changed:
+                updated.append(link)
+                update_fields |= changed
+            all_links.append(link)
+
+        found = set(l.reddit_id for l in all_links)
+        created = [l for l in by_reddit_id.values() if l.reddit_id not in found]
+        if updated:
+            cls.manager.bulk_update(updated, sorted(update_fields))
+        if created:
+            cls.manager.bulk_create(created)
+        all_links.extend(created)
+
+        through = Link.feeds.through
+        feed_links = (through(link_id=l.id, feed_id=feed.id) for l in all_links)
+        through.objects.bulk_create(feed_links, ignore_conflicts=True)
+
+        raw_links = [
+            l for l in metadata_changed + created if l.reddit_id in raw_metadata
+        ]
+        if raw_links:
+            LinkRawMetadata.objects.filter(link__in=raw_links).delete()
+            LinkRawMetadata.objects.bulk_create(
+                LinkRawMetadata(link_id=l.id, metadata=raw_metadata[l.reddit_id])
+                for l in raw_links
+            )
+
+    @classmethod
+    def project(cls, links: QuerySet) -> QuerySet:
+        return links.values(
+            "id",
+            "reddit_id",
+            "title",
+            "posted_at",
+            "score",
+            "is_read",
+            "is_saved",
+            "embed_data",
+            "embed_version",
+            "subreddit",
+            url=KeyTextTransform("url", "metadata"),
+            permalink=KeyTextTransform("permalink", "metadata"),
+            num_comments=KeyTransform("num_comments", "metadata"),
+        )
+
+    @classmethod
+    def fill_stale_embeds(cls, rows: List[Dict]) -> None:
+        stale = [r for r in rows if r["embed_version"] != EMBED_VERSION]
+        if not stale:
+            return
+        ids = [r["id"] for r in stale]
+        metadata = dict(cls.manager.filter(id__in=ids).values_list("id", "metadata"))
+        for row in stale:
+            row["embed_data"] = to_obj(get_embed(metadata[row["id"]]))
+
+    @classmethod
+    @transaction.atomic
+    def upsert_hn_links(cls, links: Iterable[Link]) -> None:
+        by_hn_id = {l.hn_id: l for l in links}
+        existing = cls.manager.in_bulk(by_hn_id.keys(), field_name="hn_id")
+
+        updated = []
+        update_fields = set()
+        for hn_id, link in existing.items():
+            new = by_hn_id.pop(hn_id)
+            changed = set()
+            if new.score != link.score:
+                link.score = new.score
+                changed.add("score")
+            if new.title != link.title:
+                link.title = new.title
+                changed.add("title")
+            if changed:
+                updated.append(link)
+                update_fields |= changed
+
+        if updated:
+            cls.manager.bulk_update(updated, sorted(update_fields))
+        if by_hn_id:
+            cls.manager.bulk_create(by_hn_id.values())
+
+    @classmethod
+    @transaction.atomic
+    def rescale_scores(
+        cls, changes: Iterable[Tuple[RelativeScoring, RelativeScoring]]
+    ) -> None:
+        for old, new in changes:
+            if old.score == new.score or not old.score or not new.score:
+                continue
+            links = cls.manager.filter(subreddit=new.id)
+            count = links.update(score=F("score") * old.score / new.score)
+            logging.info("Rescaled %d links for %s", count, new.id)
+
+    @classmethod
+    def get_stale_embeds(cls, version: int, limit: int) -> List[Link]:
+        query = cls.manager.filter(reddit_id__isnull=False, embed_version__lt=version)
+        query = query.only("id", "metadata")
+        return list(query[:limit])
+
+    @classmethod
+    def update_embeds(cls, links: Iterable[Link]) -> None:
+        cls.manager.bulk_update(links, ["embed_data", "embed_version"])
+
+
+class HnItemDao:
+    manager = HnItem.objects
+
+    @classmethod
+    def get_checkpoints(cls, hn_ids: Iterable[int]) -> Mapping[int, HnItem]:
+        return cls.manager.in_bulk(hn_ids)
+
+    @classmethod
+    @transaction.atomic
+    def write_checkpoints(cls, items: Iterable[HnItem]) -> None:
+        by_id = {i.id: i for i in items}
+        existing = cls.manager.in_bulk(by_id.keys())
+        fields = ["item_type", "title", "score", "fetched_at"]
+        cls.manager.bulk_update([by_id.pop(i) for i in existing], fields)
+        cls.manager.bulk_create(by_id.values())
+
+
 class RelativeScoringDao:
     manager = RelativeScoring.objects
 
     @classmethod
-    def get_next_to_refresh(cls, cutoff: datetime) -> Iterable[RelativeScoring]:
-        return cls.manager.filter(last_updated__lte=cutoff).order_by("last_updated")[:1]
+    def lock(cls) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s)", [settings.REDDIT_SCORING_LOCK]
+            )
+
+    @classmethod
+    def get_scorings(cls, ids: Iterable[str]) -> Mapping[str, RelativeScoring]:
+        return cls.manager.in_bulk(ids)
+
+    @classmethod
+    def get_next_to_refresh(
+        cls, cutoff: datetime, limit: int
+    ) -> Iterable[RelativeScoring]:
+        query = cls.manager.filter(Q(is_provisional=True) | Q(last_updated__lte=cutoff))
+        return query.order_by("failures", "-is_provisional", "last_updated")[:limit]
+
+    @classmethod
+    def create_provisional(cls, scorings: Iterable[RelativeScoring]) -> None:
+        cls.manager.bulk_create(scorings, ignore_conflicts=True)
+
+    @classmethod
+    def update_scores(cls, scorings: Iterable[RelativeScoring]) -> None:
+        fields = ["score", "last_updated", "is_provisional", "failures"]
+        cls.manager.bulk_update(scorings, fields)
+
+    @classmethod
+    def update_failures(cls, scorings: Iterable[RelativeScoring]) -> None:
+        cls.manager.bulk_update(scorings, ["last_updated", "failures"])
 
 
 class SeenSubmissionDao:
     manager = SeenSubmission.objects
 
     @classmethod
-    def get_seen_ids(cls, user_id: str, ids: Iterable[str]) -> Iterable[str]:
+    def get_seen_ids(cls, user_id: int, ids: Iterable[str]) -> Iterable[str]:
+        if settings.SEEN_SUBMISSION_STORE == "bitmap":
+            return SeenChunkDao.get_seen_ids(user_id, ids)
         query = cls.manager.filter(user_id=user_id, submission_id__in=ids)
         return query.values_list("submission_id", flat=True)
 
     @classmethod
-    def mark_seen(cls, user_id: str, ids: Iterable[str]) -> None:
-        seen = (SeenSubmission(user_id=user_id, submission_id=s) for s in ids)
-        cls.manager.bulk_create(seen, ignore_conflicts=True)
\ No newline at end of file
+    def mark_seen(cls, user_id: int, ids: Iterable[str]) -> None:
+        cls.mark_seen_many({user_id: ids})
+
+    @classmethod
+    def mark_seen_many(cls, seen: Mapping[int, Iterable[str]]) -> None:
+        if settings.SEEN_SUBMISSION_STORE == "bitmap":
+            for user_id, ids in seen.items():
+                SeenChunkDao.mark_seen(user_id, ids)
+            return
+        seen_at = datetime.now(timezone.utc)
+        rows = [
+            (uuid.uuid4(), user_id, s, seen_at)
+            for user_id, ids in seen.items()
+            for s in ids
+        ]
+        table = SeenSubmission._meta.db_table
+        sql = (
+            'INSERT INTO "%s" (id, user_id, submission_id, seen_at) VALUES %%s'
+            " ON CONFLICT DO NOTHING" % table
+        )
+        with connection.cursor() as cursor, connection.wrap_database_errors:
+            execute_values(
+                cursor.cursor, sql, rows, page_size=settings.SEEN_INSERT_BATCH_SIZE
+            )
+
+
+class SeenChunkDao:
+    manager = SeenChunk.objects
+
+    @classmethod
+    def get_seen_ids(cls, user_id: int, ids: Iterable[str]) -> Iterable[str]:
+        by_key = group_by_chunk(ids)
+        chunks = cls.manager.filter(user_id=user_id, key__in=by_key.keys())
+        return [
+            reddit_id
+            for key, data in chunks.values_list("key", "data")
+            for reddit_id, value in by_key[key]
+            if bitmap.contains(bytes(data), value)
+        ]
+
+    @classmethod
+    @transaction.atomic
+    def mark_seen(cls, user_id: int, ids: Iterable[str]) -> None:
+        by_key = group_by_chunk(ids)
+        empty = (SeenChunk(user_id=user_id, key=k, data=b"") for k in by_key)
+        cls.manager.bulk_create(empty, ignore_conflicts=True)
+
+        chunks = cls.manager.select_for_update().filter(
+            user_id=user_id, key__in=by_key.keys()
+        )
+        now = datetime.now(timezone.utc)
+        updated = []
+        for chunk in chunks:
+            values = (value for _, value in by_key[chunk.key])
+            data = bitmap.add_all(bytes(chunk.data), values)
+            if data != bytes(chunk.data):
+                chunk.data = data
+                chunk.updated_at = now
+                updated.append(chunk)
+        cls.manager.bulk_update(updated, ["data", "updated_at"])
+
+
+class RetentionDao:
+    # Rows that cascade from each model, deleted directly so the collector
+    # never loads them
+    dependents: Mapping[Type[Model], List[Tuple[Type[Model], str]]] = {
+        Link: [(Link.feeds.through, "link"), (LinkRawMetadata, "link")],
+    }
+
+    @classmethod
+    @transaction.atomic
+    def delete_batch(cls, query: QuerySet, batch_size: int) -> Tuple[int, int]:
+        pks = list(query.values_list("pk", flat=True)[:batch_size])
+        if not pks:
+            return 0, 0
+        size = 0
+        for model, field in cls.dependents.get(query.model, []):
+            size += cls.delete_rows(model.objects.filter(**{f"{field}__in": pks}))[1]
+        count, main_size = cls.delete_rows(query.model.objects.filter(pk__in=pks))
+        return count, size + main_size
+
+    @classmethod
+    def delete_rows(cls, rows: QuerySet) -> Tuple[int, int]:
+        row_size = RawSQL('pg_column_size("%s".*)' % rows.model._meta.db_table, [])
+        size = rows.aggregate(size=Sum(row_size))["size"] or 0
+        # pylint: disable=protected-access
+        return rows._raw_delete(rows.db), size
+
+
+def group_by_chunk(ids: Iterable[str]) -> Mapping[int, List[Tuple[str, int]]]:
+    by_key: Dict[int, List[Tuple[str, int]]] = {}
+    for reddit_id in ids:
+        try:
+            key, value = bitmap.split_id(int(reddit_id, 36))
+        except (TypeError, ValueError):
+            continue
+        by_key.setdefault(key, []).append((reddit_id, value))
+    return by_key
@@ -63,6 +63,7 @@ class Submission:
 @dataclass
 class SubmissionResults:
     results: List[Submission]
+    after: Optional[str] = None
 
 
 @dataclass
@@ -8,6 +8,8 @@ from django.utils.safestring import mark_safe
 from .data import Embed
 from .utils import first
 
+EMBED_VERSION = 1
+
 EMBED_TYPE_HTML = "html"
 EMBED_TYPE_VIDEO = "video"
 EMBED_TYPE_IMAGE = "image"
@@ -1,16 +1,23 @@
 import logging
 import requests
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
 from django.conf import settings
 from requests.adapters import HTTPAdapter
-from typing import Any, List
+from typing import Any, Iterable, Iterator, List, Mapping, Optional
 from urllib3.util.retry import Retry
 
-from .models import Link
+from .dao import HnItemDao, LinkDao
+from .models import HnItem, Link
+from .utils import from_timestamp_utc
 
-retry = Retry(total=3, backoff_factor=0.5)
-adapter = HTTPAdapter(max_retries=retry)
+retry = Retry(
+    total=settings.HN_FETCH_RETRIES,
+    backoff_factor=0.5,
+    status_forcelist=(429, 500, 502, 503, 504),
+)
+adapter = HTTPAdapter(max_retries=retry, pool_maxsize=settings.HN_FETCH_WORKERS)
 http = requests.Session()
 http.mount("https://", adapter)
 http.mount("http://", adapter)
@@ -18,38 +25,85 @@ http.mount("http://", adapter)
 
 def get_hn_json(path: str) -> Any:
     response = http.get(
-        "https://hacker-news.firebaseio.com/v0/%s.json" % path, timeout=10
+        "https://hacker-news.firebaseio.com/v0/%s.json" % path,
+        timeout=settings.HN_FETCH_TIMEOUT,
     )
     response.raise_for_status()
     return response.json()
 
 
+def get_hn_items(hn_ids: Iterable[int]) -> Iterator[Mapping]:
+    with ThreadPoolExecutor(max_workers=settings.HN_FETCH_WORKERS) as pool:
+        futures = {pool.submit(get_hn_json, "item/%d" % i): i for i in hn_ids}
+        for future in as_completed(futures):
+            try:
+                item = future.result()
+            except Exception:
+                logging.exception("Error fetching Hacker News item %d", futures[future])
+                continue
+            if item:
+                yield item
+
+
 def sync_top_stories() -> None:
     logging.info("Syncing top Hacker News stories")
-    top_stories: List[int] = get_hn_json("topstories")
-    for hn_id in top_stories[: settings.HN_TOP_STORIES]:
-        metadata = get_hn_json("item/%d" % hn_id)
-        if metadata["type"] == "job":
-            continue
-        link, created = Link.objects.get_or_create(
-            hn_id=hn_id,
-            defaults={
-                "title": metadata["title"],
-                "posted_at": datetime.fromtimestamp(metadata["time"], timezone.utc),
-                "score": metadata["score"],
-                "metadata": metadata,
-            },
+    top_stories: List[int] = get_hn_json("topstories")[: settings.HN_TOP_STORIES]
+    checkpoints = HnItemDao.get_checkpoints(top_stories)
+    incremental = settings.HN_INCREMENTAL_SYNC
+    if incremental:
+        top_stories = get_changed_ids(top_stories, checkpoints)
+        logging.info("Refetching %d changed Hacker News stories", len(top_stories))
+
+    now = datetime.now(timezone.utc)
+    items = list(get_hn_items(top_stories))
+    links = [
+        Link(
+            hn_id=metadata["id"],
+            title=metadata["title"],
+            posted_at=from_timestamp_utc(metadata["time"]),
+            score=metadata["score"],
+            metadata=metadata,
+        )
+        for metadata in items
+        if is_story(metadata)
+        and (not incremental or is_changed(metadata, checkpoints.get(metadata["id"])))
+    ]
+    LinkDao.upsert_hn_links(links)
+    HnItemDao.write_checkpoints(
+        HnItem(
+            id=metadata["id"],
+            item_type=metadata.get("type") or "",
+            title=metadata.get("title") or "",
+            score=metadata.get("score") or 0,
+            fetched_at=now,
         )
-        if created:
-            continue
-
-        update_fields = []
-        if metadata["score"] != link.score:
-            link.score = metadata["score"]
-            update_fields.append("score")
-        if metadata["title"] != link.title:
-            link.title = metadata["title"]
-            update_fields.append("title")
-        if update_fields:
-            link.save(update_fields=update_fields)
+        for metadata in items
+    )
     logging.info("Finished syncing top Hacker News stories")
+
+
+def get_changed_ids(hn_ids: List[int], checkpoints: Mapping[int, HnItem]) -> List[int]:
+    updates = set(get_hn_json("updates").get("items") or [])
+    cutoff = datetime.now(timezone.utc) - settings.HN_ITEM_REFRESH_DELAY
+
+    def is_stale(hn_id: int) -> bool:
+        checkpoint = checkpoints.get(hn_id)
+        if checkpoint is None:
+            return True
+        if checkpoint.item_type == "job":
+            return False
+        return hn_id in updates or checkpoint.fetched_at <= cutoff
+
+    return [i for i in hn_ids if is_stale(i)]
+
+
+def is_story(metadata: Mapping) -> bool:
+    return metadata.get("type") != "job" and not metadata.get("deleted")
+
+
+def is_changed(metadata: Mapping, checkpoint: Optional[HnItem]) -> bool:
+    return (
+        checkpoint is None
+        or checkpoint.score != metadata["score"]
+        or checkpoint.title != metadata["title"]
+    )
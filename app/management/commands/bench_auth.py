@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Callable
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.auth import ProfileAuthenticationBackend
+from app.dao import ProfileDao
+from app.data import Token
+from app.tokens import get_profile_tokens
+
+UserModel = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+def load_and_decrypt(user_id: int) -> None:
+    user = UserModel.objects.select_related("profile").get(pk=user_id)
+    user.profile.parse_enc_tokens()
+
+
+def load_and_use_cache(user_id: int) -> None:
+    user = ProfileAuthenticationBackend().get_user(user_id)
+    get_profile_tokens(user.profile)
+
+
+def time_calls(func: Callable[[int], None], user_id: int, count: int) -> float:
+    start = perf_counter()
+    for _ in range(count):
+        func(user_id)
+    return (perf_counter() - start) / count
+
+
+class Command(BaseCommand):
+    help = "Times loading a user and their parsed Reddit tokens per request"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--reddit-users", type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            self.stdout.write("Rolled back seeded data")
+
+    def run(self, options):
+        user = UserModel.objects.create(username=uuid.uuid4().hex)
+        expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+        for i in range(options["reddit_users"]):
+            token = Token(uuid.uuid4().hex, uuid.uuid4().hex, expires_at)
+            ProfileDao.write_token(user.id, "user%d" % i, token)
+
+        for func in (load_and_decrypt, load_and_use_cache):
+            per_request = time_calls(func, user.id, options["requests"])
+            self.stdout.write(
+                "%s: %.0fus per request" % (func.__name__, per_request * 1e6)
+            )
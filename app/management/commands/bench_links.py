@@ -0,0 +1,206 @@
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Callable, List
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, QuerySet, Subquery
+from rest_framework.serializers import CharField, ModelSerializer
+
+from app.api import LinkSerializer
+from app.dao import LinkDao
+from app.embed import EMBED_VERSION, get_embed
+from app.models import Link, SeenSubmission
+from app.utils import to_obj
+
+
+class Rollback(Exception):
+    pass
+
+
+def to_base36(num: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    result = ""
+    while num:
+        num, rem = divmod(num, 36)
+        result = digits[rem] + result
+    return result or "0"
+
+
+class InstanceLinkSerializer(ModelSerializer):
+    id = CharField(source="reddit_id", read_only=True)
+
+    class Meta:
+        model = Link
+        fields = (
+            "id",
+            "title",
+            "posted_at",
+            "subreddit",
+            "score",
+            "url",
+            "permalink",
+            "num_comments",
+            "is_read",
+            "is_saved",
+            "embed",
+        )
+
+
+def make_metadata(i: int) -> dict:
+    media_ids = ["m%d_%d" % (i, n) for n in range(10)]
+    return {
+        "subreddit": "bench",
+        "permalink": "/r/bench/%d" % i,
+        "url": "https://www.reddit.com/gallery/%d" % i,
+        "num_comments": i % 300,
+        "over_18": False,
+        "gallery_data": {"items": [{"media_id": m} for m in media_ids]},
+        "media_metadata": {
+            m: {"s": {"u": "https://i.redd.it/%s.jpg" % m, "x": 1080, "y": 1350}}
+            for m in media_ids
+        },
+        "crosspost_parent_list": [],
+    }
+
+
+def seed(links: int, seen: int, user_id: int, batch_size: int = 10000) -> None:
+    start = datetime.now(timezone.utc)
+    first_id = 36**5
+    for offset in range(0, links, batch_size):
+        metadata = [make_metadata(i) for i in range(offset, offset + batch_size)]
+        Link.objects.bulk_create(
+            Link(
+                reddit_id=to_base36(first_id + i),
+                subreddit=md["subreddit"],
+                title="Link %d" % i,
+                posted_at=start - timedelta(minutes=i),
+                score=(i * 7919) % 5000,
+                metadata=md,
+                embed_data=to_obj(get_embed(md)),
+                embed_version=EMBED_VERSION,
+            )
+            for i, md in zip(range(offset, min(offset + batch_size, links)), metadata)
+        )
+    step = max(links // seen, 1) if seen else 1
+    for offset in range(0, seen, batch_size):
+        SeenSubmission.objects.bulk_create(
+            SeenSubmission(
+                user_id=user_id, submission_id=to_base36(first_id + i * step)
+            )
+            for i in range(offset, min(offset + batch_size, seen))
+        )
+
+
+def not_in_query(user_id: int) -> QuerySet:
+    links = Link.objects.exclude(reddit_id=None)
+    seen = SeenSubmission.objects.filter(user_id=user_id)
+    return links.exclude(reddit_id__in=Subquery(seen.values("submission_id")))
+
+
+def not_exists_query(user_id: int) -> QuerySet:
+    links = Link.objects.exclude(reddit_id=None)
+    seen = SeenSubmission.objects.filter(
+        user_id=user_id, submission_id=OuterRef("reddit_id")
+    )
+    return links.filter(~Exists(seen))
+
+
+def render_instances(query: QuerySet) -> list:
+    return InstanceLinkSerializer(list(query), many=True).data
+
+
+def render_values(query: QuerySet) -> list:
+    rows = list(LinkDao.project(query))
+    LinkDao.fill_stale_embeds(rows)
+    return LinkSerializer(rows, many=True).data
+
+
+def time_renders(
+    query: QuerySet, render: Callable[[QuerySet], list], pages: int, page_size: int
+) -> List[float]:
+    timings = []
+    query = query.filter(score__gte=500).order_by("-posted_at")
+    for page in range(pages):
+        start = perf_counter()
+        render(query[page * page_size : (page + 1) * page_size])
+        timings.append(perf_counter() - start)
+    return timings
+
+
+def time_pages(query: QuerySet, pages: int, page_size: int) -> List[float]:
+    timings = []
+    query = query.filter(score__gte=500).order_by("-posted_at")
+    cursor = None
+    for _ in range(pages):
+        page_query = query.filter(posted_at__lt=cursor) if cursor else query
+        start = perf_counter()
+        page = list(page_query[:page_size])
+        timings.append(perf_counter() - start)
+        if not page:
+            break
+        cursor = page[-1].posted_at
+    return timings
+
+
+class Command(BaseCommand):
+    help = "Seeds links and seen submissions and times curated feed pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--links", type=int, default=1000000)
+        parser.add_argument("--seen", type=int, default=200000)
+        parser.add_argument("--pages", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            self.stdout.write("Rolled back seeded data")
+
+    def run(self, options):
+        user = get_user_model().objects.create(username=uuid.uuid4().hex)
+        self.stdout.write(
+            "Seeding %d links and %d seen submissions"
+            % (options["links"], options["seen"])
+        )
+        start = perf_counter()
+        seed(options["links"], options["seen"], user.id)
+        self.stdout.write("Seeded in %.1fs" % (perf_counter() - start))
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        queries: List[Callable[[int], QuerySet]] = [not_in_query, not_exists_query]
+        for get_query in queries:
+            timings = time_pages(
+                get_query(user.id), options["pages"], options["page_size"]
+            )
+            self.write_timings(get_query.__name__, timings)
+
+        renders: List[Callable[[QuerySet], list]] = [render_instances, render_values]
+        for render in renders:
+            timings = time_renders(
+                not_exists_query(user.id),
+                render,
+                options["pages"],
+                options["page_size"],
+            )
+            self.write_timings(render.__name__, timings)
+
+    def write_timings(self, name: str, timings: List[float]) -> None:
+        timings_ms = sorted(t * 1000 for t in timings)
+        self.stdout.write(
+            "%s: %d pages, first %.1fms, median %.1fms, max %.1fms"
+            % (
+                name,
+                len(timings),
+                timings[0] * 1000,
+                timings_ms[len(timings_ms) // 2],
+                timings_ms[-1],
+            )
+        )
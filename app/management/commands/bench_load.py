@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import local
+from time import perf_counter
+from typing import List, Optional, Tuple
+
+from django.core.management.base import BaseCommand
+import requests
+
+sessions = local()
+
+
+def get_session(cookie: Optional[str]) -> requests.Session:
+    session = getattr(sessions, "session", None)
+    if session is None:
+        session = sessions.session = requests.Session()
+        if cookie:
+            session.cookies.set("sessionid", cookie)
+    return session
+
+
+def timed_get(url: str, cookie: Optional[str]) -> Tuple[float, bool]:
+    start = perf_counter()
+    try:
+        response = get_session(cookie).get(url, timeout=60)
+        ok = response.status_code == 200
+    except requests.RequestException:
+        ok = False
+    return perf_counter() - start, ok
+
+
+def percentile(sorted_timings: List[float], pct: int) -> float:
+    index = min(len(sorted_timings) * pct // 100, len(sorted_timings) - 1)
+    return sorted_timings[index]
+
+
+class Command(BaseCommand):
+    help = "Fires concurrent GETs at the API and reports throughput and latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--session-cookie")
+        parser.add_argument("--warmup", type=int, default=0)
+        parser.add_argument(
+            "--base",
+            action="append",
+            default=[],
+            help="Prefix each url with this base; repeat to compare servers",
+        )
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"]
+        count = options["requests"]
+        cookie = options["session_cookie"]
+        bases = options["base"] or [""]
+        urls = [base + path for path in options["urls"] for base in bases]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for url in urls:
+                list(
+                    pool.map(lambda _: timed_get(url, cookie), range(options["warmup"]))
+                )
+
+                start = perf_counter()
+                results = list(pool.map(lambda _: timed_get(url, cookie), range(count)))
+                elapsed = perf_counter() - start
+
+                timings = sorted(t * 1000 for t, _ in results)
+                errors = sum(1 for _, ok in results if not ok)
+                self.stdout.write(
+                    "%s: %d requests x%d, %.1f req/s, p50 %.0fms, p95 %.0fms, "
+                    "p99 %.0fms, %d errors"
+                    % (
+                        url,
+                        count,
+                        concurrency,
+                        count / elapsed,
+                        percentile(timings, 50),
+                        percentile(timings, 95),
+                        percentile(timings, 99),
+                        errors,
+                    )
+                )
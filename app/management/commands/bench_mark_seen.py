@@ -0,0 +1,70 @@
+from time import perf_counter
+from typing import List, Tuple
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.dao import SeenSubmissionDao
+from app.management.commands.bench_links import to_base36
+from app.seen import SeenBuffer
+
+UserModel = get_user_model()
+
+
+def make_requests(
+    prefix: str, user_ids: List[int], requests: int, size: int
+) -> List[Tuple[int, List[str]]]:
+    return [
+        (
+            user_ids[i % len(user_ids)],
+            [prefix + to_base36(i * size + n) for n in range(size)],
+        )
+        for i in range(requests)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Times mark_seen inserts per request against the write-behind buffer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--ids-per-request", type=int, default=10)
+
+    def handle(self, *args, **options):
+        users = [
+            UserModel.objects.create(username=uuid.uuid4().hex)
+            for _ in range(options["users"])
+        ]
+        try:
+            self.run([u.id for u in users], options)
+        finally:
+            UserModel.objects.filter(id__in=[u.id for u in users]).delete()
+
+    def run(self, user_ids: List[int], options):
+        size = options["ids_per_request"]
+        requests = make_requests("a", user_ids, options["requests"], size)
+        rows = len(requests) * size
+
+        start = perf_counter()
+        for user_id, ids in requests:
+            with transaction.atomic():
+                SeenSubmissionDao.mark_seen(user_id, ids)
+        self.write_result("per_request", rows, perf_counter() - start)
+
+        requests = make_requests("b", user_ids, options["requests"], size)
+        buffer = SeenBuffer(
+            flush_interval=3600, max_size=rows + 1, max_pending=rows + 1
+        )
+        start = perf_counter()
+        for user_id, ids in requests:
+            buffer.add(user_id, ids)
+        buffer.flush()
+        self.write_result("write_behind", rows, perf_counter() - start)
+
+    def write_result(self, name: str, rows: int, elapsed: float) -> None:
+        self.stdout.write(
+            "%s: %d rows in %.2fs, %.0f rows/s" % (name, rows, elapsed, rows / elapsed)
+        )
@@ -0,0 +1,84 @@
+from time import perf_counter
+from typing import Any, Callable, List, Tuple
+import json
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from app import utils
+from app.data import Embed, Submission, SubmissionResults
+from app.utils import PydanticJSONRenderer, RestPydanticJSONEncoder
+
+
+class EncoderJSONRenderer(JSONRenderer):
+    encoder_class = RestPydanticJSONEncoder
+
+
+def make_results(count: int) -> SubmissionResults:
+    def make_embed(i: int) -> Embed:
+        image = Embed("image", url="https://i.redd.it/%d.jpg" % i, width=640)
+        video = Embed("video", url="https://v.redd.it/%d" % i, height=360)
+        return Embed("gallery", gallery=[image] * 5, video=video, over_18=False)
+
+    return SubmissionResults(
+        [
+            Submission(
+                id="s%d" % i,
+                title="Submission title number %d" % i,
+                posted_at="3 hours ago",
+                subreddit="bench",
+                score=i * 13,
+                url="https://example.com/%d" % i,
+                permalink="/r/bench/comments/s%d/" % i,
+                num_comments=i,
+                embed=make_embed(i),
+            )
+            for i in range(count)
+        ]
+    )
+
+
+def time_render(render: Callable[[Any], bytes], data: Any, seconds: float) -> float:
+    renders = 0
+    start = perf_counter()
+    while perf_counter() - start < seconds:
+        render(data)
+        renders += 1
+    return renders / (perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = "Times rendering a SubmissionResults page with each JSON path"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100)
+        parser.add_argument("--seconds", type=float, default=3.0)
+
+    def handle(self, *args, **options):
+        data = make_results(options["items"])
+        orjson = utils.orjson
+
+        def render_stdlib(thing: Any) -> bytes:
+            utils.orjson = None
+            try:
+                return PydanticJSONRenderer().render(thing)
+            finally:
+                utils.orjson = orjson
+
+        renderers: List[Tuple[str, Callable[[Any], bytes]]] = [
+            ("pydantic_encoder", EncoderJSONRenderer().render),
+            ("to_primitive+json", render_stdlib),
+        ]
+        if orjson is not None:
+            renderers.append(("orjson", PydanticJSONRenderer().render))
+
+        expected = json.loads(EncoderJSONRenderer().render(data))
+        baseline = None
+        for name, render in renderers:
+            if json.loads(render(data)) != expected:
+                raise Exception("%s rendered different JSON" % name)
+            rate = time_render(render, data, options["seconds"])
+            baseline = baseline or rate
+            self.stdout.write(
+                "%s: %.0f renders/s (%.1fx)" % (name, rate, rate / baseline)
+            )
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from app.dao import SeenChunkDao
+from app.models import SeenSubmission
+
+
+class Command(BaseCommand):
+    help = "Copies seen submissions from the SeenSubmission table into SeenChunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete the copied SeenSubmission rows",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        user_ids = SeenSubmission.objects.values_list("user_id", flat=True)
+        for user_id in user_ids.distinct().order_by("user_id"):
+            copied = 0
+            last_pk = None
+            while True:
+                rows = SeenSubmission.objects.filter(user_id=user_id).order_by("pk")
+                if last_pk is not None:
+                    rows = rows.filter(pk__gt=last_pk)
+                batch = list(rows.values_list("pk", "submission_id")[:batch_size])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    SeenChunkDao.mark_seen(user_id, (s for _, s in batch))
+                    if options["delete"]:
+                        pks = [pk for pk, _ in batch]
+                        SeenSubmission.objects.filter(pk__in=pks).delete()
+                last_pk = batch[-1][0]
+                copied += len(batch)
+            self.stdout.write(
+                "Copied %d seen submissions for user %s" % (copied, user_id)
+            )
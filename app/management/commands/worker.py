@@ -0,0 +1,36 @@
+import logging
+import logging.config
+
+from django.core.management.base import BaseCommand
+
+from app.tasks import run_as_leader, run_tasks
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "json": {
+            "()": "app.log.JSONFormatter",
+            "format": "%(message)s",
+        },
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "formatter": "json",
+        },
+    },
+    "root": {
+        "handlers": ["console"],
+        "level": "INFO",
+    },
+}
+
+
+class Command(BaseCommand):
+    help = "Runs the background tasks once this worker holds the leader lock"
+
+    def handle(self, *args, **options):
+        if not logging.getLogger().hasHandlers():
+            logging.config.dictConfig(LOGGING)
+        run_as_leader(run_tasks)
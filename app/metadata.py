@@ -0,0 +1,83 @@
+from typing import Any, Iterable, Mapping, Optional
+
+LINK_FIELDS = (
+    "id",
+    "is_self",
+    "over_18",
+    "num_comments",
+    "post_hint",
+    "url",
+    "permalink",
+    "subreddit",
+)
+IMAGE_FIELDS = ("url", "width", "height")
+VIDEO_FIELDS = ("fallback_url", "width", "height")
+MEDIA_EMBED_FIELDS = ("content", "width", "height")
+GALLERY_IMAGE_FIELDS = ("u", "x", "y")
+
+
+def trim_metadata(md: Mapping) -> Mapping:
+    trimmed = {k: md[k] for k in LINK_FIELDS if md.get(k) is not None}
+    parts = {
+        "preview": trim_preview(md.get("preview")),
+        "media": trim_media(md.get("media")),
+        "secure_media": trim_media(md.get("secure_media")),
+        "media_embed": pick(md.get("media_embed"), MEDIA_EMBED_FIELDS),
+        "secure_media_embed": pick(md.get("secure_media_embed"), MEDIA_EMBED_FIELDS),
+    }
+    trimmed.update((k, v) for k, v in parts.items() if v)
+
+    gallery_data = md.get("gallery_data") or {}
+    items = [
+        {"media_id": i.get("media_id")} for i in gallery_data.get("items") or [] if i
+    ]
+    if items:
+        trimmed["gallery_data"] = {"items": items}
+        media = md.get("media_metadata") or {}
+        ids = (item["media_id"] for item in items if item["media_id"])
+        trimmed["media_metadata"] = {
+            id: {"s": pick(media[id].get("s"), GALLERY_IMAGE_FIELDS)}
+            for id in ids
+            if media.get(id)
+        }
+
+    parents = md.get("crosspost_parent_list") or []
+    trimmed["crosspost_parent_list"] = [trim_metadata(p) for p in parents]
+    return trimmed
+
+
+def trim_preview(preview: Optional[Mapping]) -> Optional[Mapping]:
+    if not preview:
+        return None
+
+    def trim_image(img: Mapping) -> Mapping:
+        variants = img.get("variants") or {}
+        mp4 = variants.get("mp4") or {}
+        trimmed: dict = {"source": pick(img.get("source"), IMAGE_FIELDS)}
+        if mp4.get("source"):
+            trimmed["variants"] = {"mp4": {"source": pick(mp4["source"], IMAGE_FIELDS)}}
+        return trimmed
+
+    trimmed: dict = {"images": [trim_image(img) for img in preview.get("images") or []]}
+    rvp = pick(preview.get("reddit_video_preview"), VIDEO_FIELDS)
+    if rvp:
+        trimmed["reddit_video_preview"] = rvp
+    return trimmed
+
+
+def trim_media(media: Optional[Mapping]) -> Optional[Mapping]:
+    if not media:
+        return None
+    trimmed = {"type": media.get("type")}
+    reddit_video = pick(media.get("reddit_video"), VIDEO_FIELDS)
+    if reddit_video:
+        trimmed["reddit_video"] = reddit_video
+    return trimmed
+
+
+def pick(
+    thing: Optional[Mapping], fields: Iterable[str]
+) -> Optional[Mapping[str, Any]]:
+    if not thing:
+        return None
+    return {k: thing[k] for k in fields if k in thing}
\ No newline at end of file
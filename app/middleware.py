@@ -0,0 +1,9 @@
+from django.middleware.gzip import GZipMiddleware
+
+
+# HTML pages embed CSRF tokens, so only JSON is compressed (BREACH)
+class JsonGZipMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        if not response.get("Content-Type", "").startswith("application/json"):
+            return response
+        return super().process_response(request, response)
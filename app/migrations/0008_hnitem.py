@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_profile_enc_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HnItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('item_type', models.CharField(max_length=20)),
+                ('title', models.TextField(blank=True)),
+                ('score', models.BigIntegerField(default=0)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
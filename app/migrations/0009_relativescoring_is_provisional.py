@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_hnitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relativescoring',
+            name='is_provisional',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_relativescoring_is_provisional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='metadata_hash',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
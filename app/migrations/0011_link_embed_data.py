@@ -0,0 +1,23 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_link_metadata_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='embed_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='link',
+            name='embed_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_link_embed_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['reddit_id'], name='link_reddit_id'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(condition=models.Q(reddit_id__isnull=False), fields=['-posted_at', 'score'], name='link_reddit_posted_at'),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['-score'], name='link_score'),
+        ),
+    ]
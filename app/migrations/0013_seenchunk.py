@@ -0,0 +1,31 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('app', '0012_link_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeenChunk',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False)),
+                ('key', models.BigIntegerField()),
+                ('data', models.BinaryField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seenchunk',
+            constraint=models.UniqueConstraint(fields=('user', 'key'), name='unique_seen_chunk'),
+        ),
+    ]
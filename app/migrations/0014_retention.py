@@ -0,0 +1,36 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:27
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_seenchunk'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seensubmission',
+            name='seen_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='hnitem',
+            name='fetched_at',
+            field=models.DateTimeField(db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['posted_at'], name='link_posted_at'),
+        ),
+        migrations.AddIndex(
+            model_name='seenchunk',
+            index=models.Index(fields=['updated_at'], name='seen_chunk_updated_at'),
+        ),
+        migrations.AddIndex(
+            model_name='seensubmission',
+            index=models.Index(fields=['seen_at'], name='seen_submission_seen_at'),
+        ),
+    ]
@@ -0,0 +1,140 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:38
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+BATCH_SIZE = 1000
+
+# Frozen copies of app.metadata.trim_metadata and app.utils.hash_json as of
+# this migration, so later edits to those helpers don't change what it does.
+LINK_FIELDS = (
+    'id',
+    'is_self',
+    'over_18',
+    'num_comments',
+    'post_hint',
+    'url',
+    'permalink',
+    'subreddit',
+)
+IMAGE_FIELDS = ('url', 'width', 'height')
+VIDEO_FIELDS = ('fallback_url', 'width', 'height')
+MEDIA_EMBED_FIELDS = ('content', 'width', 'height')
+GALLERY_IMAGE_FIELDS = ('u', 'x', 'y')
+
+
+def pick(thing, fields):
+    if not thing:
+        return None
+    return {k: thing[k] for k in fields if k in thing}
+
+
+def trim_preview(preview):
+    if not preview:
+        return None
+
+    def trim_image(img):
+        variants = img.get('variants') or {}
+        mp4 = variants.get('mp4') or {}
+        trimmed = {'source': pick(img.get('source'), IMAGE_FIELDS)}
+        if mp4.get('source'):
+            trimmed['variants'] = {'mp4': {'source': pick(mp4['source'], IMAGE_FIELDS)}}
+        return trimmed
+
+    trimmed = {'images': [trim_image(img) for img in preview.get('images') or []]}
+    rvp = pick(preview.get('reddit_video_preview'), VIDEO_FIELDS)
+    if rvp:
+        trimmed['reddit_video_preview'] = rvp
+    return trimmed
+
+
+def trim_media(media):
+    if not media:
+        return None
+    trimmed = {'type': media.get('type')}
+    reddit_video = pick(media.get('reddit_video'), VIDEO_FIELDS)
+    if reddit_video:
+        trimmed['reddit_video'] = reddit_video
+    return trimmed
+
+
+def trim_metadata(md):
+    trimmed = {k: md[k] for k in LINK_FIELDS if md.get(k) is not None}
+    parts = {
+        'preview': trim_preview(md.get('preview')),
+        'media': trim_media(md.get('media')),
+        'secure_media': trim_media(md.get('secure_media')),
+        'media_embed': pick(md.get('media_embed'), MEDIA_EMBED_FIELDS),
+        'secure_media_embed': pick(md.get('secure_media_embed'), MEDIA_EMBED_FIELDS),
+    }
+    trimmed.update((k, v) for k, v in parts.items() if v)
+
+    gallery_data = md.get('gallery_data') or {}
+    items = [
+        {'media_id': i.get('media_id')} for i in gallery_data.get('items') or [] if i
+    ]
+    if items:
+        trimmed['gallery_data'] = {'items': items}
+        media = md.get('media_metadata') or {}
+        ids = (item['media_id'] for item in items if item['media_id'])
+        trimmed['media_metadata'] = {
+            id: {'s': pick(media[id].get('s'), GALLERY_IMAGE_FIELDS)}
+            for id in ids
+            if media.get(id)
+        }
+
+    parents = md.get('crosspost_parent_list') or []
+    trimmed['crosspost_parent_list'] = [trim_metadata(p) for p in parents]
+    return trimmed
+
+
+def hash_json(thing):
+    normalized = json.dumps(thing, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+def compact_metadata(apps, schema_editor):
+    Link = apps.get_model('app', 'Link')
+    LinkRawMetadata = apps.get_model('app', 'LinkRawMetadata')
+    links = Link.objects.filter(reddit_id__isnull=False).only('id', 'metadata')
+    last_id = None
+    while True:
+        remaining = links.filter(id__gt=last_id) if last_id else links
+        batch = list(remaining.order_by('id')[:BATCH_SIZE])
+        if not batch:
+            break
+        with transaction.atomic():
+            if settings.REDDIT_STORE_RAW_METADATA:
+                LinkRawMetadata.objects.bulk_create(
+                    (LinkRawMetadata(link_id=l.id, metadata=l.metadata) for l in batch),
+                    ignore_conflicts=True,
+                )
+            for link in batch:
+                link.metadata = trim_metadata(link.metadata)
+                link.metadata_hash = hash_json(link.metadata)
+            Link.objects.bulk_update(batch, ['metadata', 'metadata_hash'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0014_retention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkRawMetadata',
+            fields=[
+                ('link', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='raw_metadata', serialize=False, to='app.link')),
+                ('metadata', models.JSONField(default=dict)),
+            ],
+        ),
+        migrations.RunPython(compact_metadata, migrations.RunPython.noop),
+    ]
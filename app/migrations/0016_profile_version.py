@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_linkrawmetadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
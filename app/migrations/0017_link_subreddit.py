@@ -0,0 +1,43 @@
+# Generated by Django 3.1.7 on 2026-10-18 09:56
+
+from django.db import migrations, models
+from django.db.models.fields.json import KeyTextTransform
+
+BATCH_SIZE = 5000
+
+
+def fill_subreddit(apps, schema_editor):
+    Link = apps.get_model('app', 'Link')
+    links = Link.objects.filter(reddit_id__isnull=False).order_by('id')
+    last_id = None
+    while True:
+        remaining = links.filter(id__gt=last_id) if last_id else links
+        ids = list(remaining.values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        Link.objects.filter(id__in=ids).update(
+            subreddit=KeyTextTransform('subreddit', 'metadata')
+        )
+        last_id = ids[-1]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('app', '0016_profile_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='link',
+            name='subreddit',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.RunPython(fill_subreddit, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(fields=['subreddit'], name='link_subreddit'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.7 on 2026-10-18 10:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_link_subreddit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='relativescoring',
+            name='failures',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.7 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_relativescoring_failures'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='link',
+            index=models.Index(condition=models.Q(reddit_id__isnull=False), fields=['embed_version'], name='link_reddit_embed_version'),
+        ),
+    ]
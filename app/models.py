@@ -4,32 +4,37 @@ import uuid
 from django.conf import settings
 from django.db.models import (
     BigIntegerField,
+    BinaryField,
     BooleanField,
     CASCADE,
     CharField,
     DateTimeField,
     ForeignKey,
+    Index,
     IntegerField,
     IntegerChoices,
     JSONField,
     ManyToManyField,
     Model,
     OneToOneField,
+    Q,
     TextField,
     UniqueConstraint,
     UUIDField,
 )
+from django.utils.timezone import now
 from django_cryptography.fields import encrypt
 
-from .data import Embed, Token
-from .embed import get_embed
-from .utils import from_raw
+from .data import Token
+from .embed import EMBED_VERSION, get_embed
+from .utils import from_raw, to_obj
 
 
 class Profile(Model):
     user = OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, on_delete=CASCADE)
     tokens = JSONField(default=dict)
     enc_tokens = encrypt(JSONField(default=dict))
+    version = IntegerField(default=0)
 
     def parse_enc_tokens(self) -> Mapping[str, Token]:
         return from_raw(Mapping[str, Token], self.enc_tokens)  # type: ignore
@@ -39,11 +44,27 @@ class SeenSubmission(Model):
     id = UUIDField(primary_key=True, default=uuid.uuid4)
     user = ForeignKey(settings.AUTH_USER_MODEL, on_delete=CASCADE)
     submission_id = CharField(max_length=6)
+    seen_at = DateTimeField(default=now)
 
     class Meta:
         constraints = [
             UniqueConstraint(fields=["user", "submission_id"], name="unique_seen")
         ]
+        indexes = [Index(fields=["seen_at"], name="seen_submission_seen_at")]
+
+
+class SeenChunk(Model):
+    id = UUIDField(primary_key=True, default=uuid.uuid4)
+    user = ForeignKey(settings.AUTH_USER_MODEL, on_delete=CASCADE)
+    key = BigIntegerField()
+    data = BinaryField()
+    updated_at = DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            UniqueConstraint(fields=["user", "key"], name="unique_seen_chunk")
+        ]
+        indexes = [Index(fields=["updated_at"], name="seen_chunk_updated_at")]
 
 
 class FeedType(IntegerChoices):
@@ -72,6 +93,7 @@ class Link(Model):
     id = UUIDField(primary_key=True, default=uuid.uuid4)
     hn_id = BigIntegerField(unique=True, null=True, blank=True)
     reddit_id = CharField(max_length=6, null=True, blank=True)
+    subreddit = CharField(max_length=100, null=True, blank=True)
     feeds = ManyToManyField(Feed)
     title = TextField()
     posted_at = DateTimeField()
@@ -80,6 +102,27 @@ class Link(Model):
     is_read = BooleanField(default=False)
     is_saved = BooleanField(default=False)
     metadata = JSONField(default=dict, blank=True)
+    metadata_hash = CharField(max_length=32, blank=True, default="")
+    embed_data = JSONField(null=True, blank=True)
+    embed_version = IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            Index(fields=["reddit_id"], name="link_reddit_id"),
+            Index(
+                fields=["-posted_at", "score"],
+                condition=Q(reddit_id__isnull=False),
+                name="link_reddit_posted_at",
+            ),
+            Index(fields=["-score"], name="link_score"),
+            Index(fields=["posted_at"], name="link_posted_at"),
+            Index(fields=["subreddit"], name="link_subreddit"),
+            Index(
+                fields=["embed_version"],
+                condition=Q(reddit_id__isnull=False),
+                name="link_reddit_embed_version",
+            ),
+        ]
 
     @property
     def permalink(self) -> str:
@@ -94,12 +137,14 @@ class Link(Model):
         return self.metadata.get("num_comments")
 
     @property
-    def subreddit(self) -> str:
-        return self.metadata.get("subreddit")
+    def embed(self) -> Optional[Mapping]:
+        if self.embed_version == EMBED_VERSION:
+            return self.embed_data
+        return to_obj(get_embed(self.metadata))
 
-    @property
-    def embed(self) -> Optional[Embed]:
-        return get_embed(self.metadata)
+    def update_embed(self) -> None:
+        self.embed_data = to_obj(get_embed(self.metadata))
+        self.embed_version = EMBED_VERSION
 
     def get_absolute_url(self):
         if self.hn_id:
@@ -109,7 +154,24 @@ class Link(Model):
         raise Exception("Unknown link type for get_absolute_url")
 
 
+class LinkRawMetadata(Model):
+    link = OneToOneField(
+        Link, primary_key=True, on_delete=CASCADE, related_name="raw_metadata"
+    )
+    metadata = JSONField(default=dict)
+
+
+class HnItem(Model):
+    id = BigIntegerField(primary_key=True)
+    item_type = CharField(max_length=20)
+    title = TextField(blank=True)
+    score = BigIntegerField(default=0)
+    fetched_at = DateTimeField(db_index=True)
+
+
 class RelativeScoring(Model):
     id = CharField(primary_key=True, max_length=100)
     score = BigIntegerField()
-    last_updated = DateTimeField()
\ No newline at end of file
+    last_updated = DateTimeField()
+    is_provisional = BooleanField(default=False)
+    failures = IntegerField(default=0)
\ No newline at end of file
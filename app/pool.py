@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from typing import Callable, Generic, Hashable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class ClientPool(Generic[T]):
+    def __init__(
+        self,
+        max_size: int,
+        max_idle: float,
+        close: Optional[Callable[[T], None]] = None,
+    ):
+        self.lock = Lock()
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.close = close
+        self.idle: "OrderedDict[Hashable, List[Tuple[float, T]]]" = OrderedDict()
+        self.size = 0
+
+    @contextmanager
+    def checkout(self, key: Hashable, factory: Callable[[], T]) -> Iterator[T]:
+        client = self.take(key)
+        if client is None:
+            client = factory()
+        try:
+            yield client
+        finally:
+            self.give(key, client)
+
+    def take(self, key: Hashable) -> Optional[T]:
+        with self.lock:
+            expired = self.expire()
+            clients = self.idle.get(key)
+            client = None
+            if clients:
+                _, client = clients.pop()
+                self.size -= 1
+                if not clients:
+                    del self.idle[key]
+        self.close_all(expired)
+        return client
+
+    def give(self, key: Hashable, client: T) -> None:
+        with self.lock:
+            self.idle.setdefault(key, []).append((monotonic(), client))
+            self.idle.move_to_end(key)
+            self.size += 1
+            evicted = []
+            while self.size > self.max_size:
+                oldest_key, clients = next(iter(self.idle.items()))
+                evicted.append(clients.pop(0)[1])
+                self.size -= 1
+                if not clients:
+                    del self.idle[oldest_key]
+        self.close_all(evicted)
+
+    def expire(self) -> List[T]:
+        cutoff = monotonic() - self.max_idle
+        expired = []
+        for key in list(self.idle.keys()):
+            clients = self.idle[key]
+            while clients and clients[0][0] < cutoff:
+                expired.append(clients.pop(0)[1])
+                self.size -= 1
+            if not clients:
+                del self.idle[key]
+        return expired
+
+    def close_all(self, clients: List[T]) -> None:
+        if self.close is not None:
+            for client in clients:
+                self.close(client)
@@ -1,67 +1,111 @@
 import logging
 import random
 
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from deepdiff import DeepDiff
 from django.conf import settings
 from django.contrib.humanize.templatetags.humanize import naturaltime
+from django.db import transaction
 from praw import Reddit
 import praw.models
-from statistics import mean
+from statistics import mean, median
+from threading import Lock, local
+from time import sleep, time
 from typing import (
     Callable,
     Iterable,
+    Iterator,
     List,
     Mapping,
     MutableMapping,
     Optional,
+    Tuple,
     TypeVar,
 )
 
-from .dao import ProfileDao, RelativeScoringDao
+from .dao import LinkDao, ProfileDao, RelativeScoringDao
 from .data import Location, Submission, Token
-from .embed import get_embed
+from .embed import EMBED_VERSION, get_embed
+from .metadata import trim_metadata
 from .models import Feed, FeedType, Link, Profile, RelativeScoring
-from .utils import from_timestamp_utc
+from .pool import ClientPool
+from .tokens import (
+    apply_token,
+    get_profile_tokens,
+    get_token_key,
+    is_expiring,
+    read_token,
+    token_cache,
+)
+from .utils import from_timestamp_utc, hash_json
 
 T = TypeVar("T")
+R = TypeVar("R")
 
 # pylint: disable=protected-access
+def close_reddit(reddit: Reddit) -> None:
+    reddit._core._requestor.close()
+
+
+oauth_clients: ClientPool[Reddit] = ClientPool(
+    settings.REDDIT_CLIENT_POOL_SIZE,
+    settings.REDDIT_CLIENT_IDLE_TIMEOUT.total_seconds(),
+    close_reddit,
+)
+anon_clients: ClientPool[Reddit] = ClientPool(
+    settings.REDDIT_CLIENT_POOL_SIZE,
+    settings.REDDIT_CLIENT_IDLE_TIMEOUT.total_seconds(),
+    close_reddit,
+)
+
+
 def use_oauth_reddit(
     profile: Profile, username: Optional[str], func: Callable[[Reddit], T]
 ) -> T:
-    tokens = profile.parse_enc_tokens()
+    tokens = get_profile_tokens(profile)
     user = username or sorted(tokens.keys())[0]
-    token = tokens[user]
+    key = get_token_key(profile.user_id, user)
+    token = token_cache.get(key, tokens[user])
 
-    reddit = Reddit(
-        user_agent=settings.REDDIT_OAUTH_USER_AGENT,
-        client_id=settings.REDDIT_OAUTH_CLIENT_ID,
-        client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
-        refresh_token=token.token_secret,
-    )
-    auth = reddit._core._authorizer
-    auth.access_token = token.token
-    auth.scopes = set(settings.REDDIT_SCOPES)
-    auth._expiration_timestamp = token.expires_at.timestamp()
-    result = func(reddit)
-    if auth.access_token != token.token:
-        token = Token(
-            auth.access_token,
-            auth.refresh_token,
-            from_timestamp_utc(auth._expiration_timestamp),
+    def create_reddit() -> Reddit:
+        return Reddit(
+            user_agent=settings.REDDIT_OAUTH_USER_AGENT,
+            client_id=settings.REDDIT_OAUTH_CLIENT_ID,
+            client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
+            refresh_token=token.token_secret,
         )
-        ProfileDao.write_token(profile.user_id, user, token)
+
+    def save_token(new_token: Token) -> None:
+        token_cache.put(key, new_token)
+        ProfileDao.write_token(profile.user_id, user, new_token)
+
+    with oauth_clients.checkout(key, create_reddit) as reddit:
+        auth = reddit._core._authorizer
+        if is_expiring(token):
+            with token_cache.refresh_lock(key):
+                token = token_cache.get(key, token)
+                if is_expiring(token):
+                    apply_token(auth, token)
+                    auth.refresh()
+                    token = read_token(auth)
+                    save_token(token)
+        apply_token(auth, token)
+        result = func(reddit)
+        if auth.access_token != token.token:
+            save_token(read_token(auth))
     return result
 
 
 def use_anon_reddit(func: Callable[[Reddit], T]) -> T:
-    reddit = Reddit(
-        user_agent=settings.REDDIT_OAUTH_USER_AGENT,
-        client_id=settings.REDDIT_OAUTH_CLIENT_ID,
-        client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
-    )
-    return func(reddit)
+    def create_reddit() -> Reddit:
+        return Reddit(
+            user_agent=settings.REDDIT_OAUTH_USER_AGENT,
+            client_id=settings.REDDIT_OAUTH_CLIENT_ID,
+            client_secret=settings.REDDIT_OAUTH_CLIENT_SECRET,
+        )
+
+    with anon_clients.checkout(None, create_reddit) as reddit:
+        return func(reddit)
 
 
 def get_submissions(subs: Iterable[praw.models.Submission]) -> Iterable[Submission]:
@@ -117,54 +161,157 @@ def sync_feeds():
         )
 
 
+class RateLimitBudget:
+    def __init__(self):
+        self.lock = Lock()
+        self.remaining: Optional[float] = None
+        self.reset_timestamp: Optional[float] = None
+
+    def wait(self) -> None:
+        while True:
+            with self.lock:
+                if self.remaining is None or self.reset_timestamp is None:
+                    return
+                if self.remaining >= 1:
+                    self.remaining -= 1
+                    return
+                delay = self.reset_timestamp - time()
+                if delay <= 0:
+                    self.remaining = None
+                    return
+            logging.info("Reddit rate limit used up, sleeping %.1fs", delay)
+            sleep(delay)
+
+    def update(self, reddit: Reddit) -> None:
+        limiter = reddit._core._rate_limiter
+        with self.lock:
+            if limiter.reset_timestamp is None:
+                return
+            if self.reset_timestamp is None or (
+                limiter.reset_timestamp >= self.reset_timestamp
+            ):
+                self.remaining = limiter.remaining
+                self.reset_timestamp = limiter.reset_timestamp
+
+
+rate_limit_budget = RateLimitBudget()
+
+
+def fetch_concurrently(
+    func: Callable[[Reddit, T], R], items: Iterable[T]
+) -> Iterator[Tuple[T, "Future[R]"]]:
+    clients = local()
+
+    def run(item: T) -> R:
+        reddit = getattr(clients, "reddit", None)
+        if reddit is None:
+            reddit = clients.reddit = get_reddit()
+        rate_limit_budget.wait()
+        try:
+            return func(reddit, item)
+        finally:
+            rate_limit_budget.update(reddit)
+
+    with ThreadPoolExecutor(max_workers=settings.REDDIT_SYNC_WORKERS) as pool:
+        futures = {pool.submit(run, item): item for item in items}
+        for future in as_completed(futures):
+            yield futures[future], future
+
+
+def get_feed_submissions(reddit: Reddit, feed: Feed) -> List[praw.models.Submission]:
+    if feed.feed_type == FeedType.REDDIT_FRONT_PAGE:
+        source = reddit.front
+    elif feed.feed_type == FeedType.REDDIT_MULTI:
+        source = reddit.multireddit(feed.metadata["owner"], feed.metadata["name"])
+    else:
+        raise Exception("Unknown feed type %s" % feed.feed_type)
+    return list(source.hot(limit=settings.REDDIT_TOP_SUBMISSIONS))
+
+
 def sync_top_submissions():
     logging.info("Syncing top reddit submissions")
-    reddit = get_reddit()
     all_scoring = {s.id: s for s in RelativeScoring.objects.all()}
-    for feed in Feed.objects.all():
+    feeds = list(Feed.objects.all())
+    for feed, future in fetch_concurrently(get_feed_submissions, feeds):
+        try:
+            submissions = future.result()
+        except Exception:
+            logging.exception("Error fetching feed %s", feed.id)
+            continue
         logging.info("Syncing feed %s", feed.id)
-        if feed.feed_type == FeedType.REDDIT_FRONT_PAGE:
-            source = reddit.front
-        elif feed.feed_type == FeedType.REDDIT_MULTI:
-            source = reddit.multireddit(feed.metadata["owner"], feed.metadata["name"])
-        else:
-            raise Exception("Unknown feed type %s" % feed.feed_type)
-        for submission in source.hot(limit=settings.REDDIT_TOP_SUBMISSIONS):
-            write_submission(reddit, all_scoring, submission, feed)
+        write_submissions(all_scoring, submissions, feed)
     logging.info("Finshed syncing top reddit submissions")
 
 
-def write_submission(reddit, all_scoring, submission, feed): 
-    scoring = get_or_create_relative_scoring(
-        all_scoring, reddit, submission.subreddit.display_name
-    )
-    relative_score = (submission.score / scoring.score) * 1000
-    if relative_score < 100:
+@transaction.atomic
+def write_submissions(all_scoring, submissions, feed):
+    RelativeScoringDao.lock()
+    subreddits = set(s.subreddit.display_name for s in submissions)
+    all_scoring.update(RelativeScoringDao.get_scorings(subreddits))
+    add_provisional_scoring(all_scoring, submissions)
+    links = []
+    raw_metadata = {}
+    for submission in submissions:
+        scoring = all_scoring[submission.subreddit.display_name]
+        relative_score = (submission.score / scoring.score) * 1000
+        if relative_score < 100:
+            continue
+        metadata = get_submission_metadata(submission.__dict__)
+        link = Link(
+            reddit_id=submission.id,
+            subreddit=metadata["subreddit"],
+            title=submission.title,
+            posted_at=from_timestamp_utc(submission.created_utc),
+            score=int(relative_score),
+        )
+        link.metadata = trim_metadata(metadata)
+        link.metadata_hash = hash_json(link.metadata)
+        link.update_embed()
+        links.append(link)
+        if settings.REDDIT_STORE_RAW_METADATA:
+            raw_metadata[link.reddit_id] = metadata
+    LinkDao.upsert_reddit_links(links, feed, raw_metadata)
+
+
+def add_provisional_scoring(
+    all_existing: MutableMapping[str, RelativeScoring],
+    submissions: List[praw.models.Submission],
+) -> None:
+    subreddits = set(s.subreddit.display_name for s in submissions)
+    missing = [s for s in subreddits if s not in all_existing]
+    if not missing:
         return
-    metadata = get_submission_metadata(submission.__dict__)
-    link, created = Link.objects.get_or_create(
-        reddit_id=submission.id,
-        defaults={
-            "title": submission.title,
-            "posted_at": datetime.fromtimestamp(submission.created_utc, timezone.utc),
-            "score": relative_score,
-            "metadata": metadata,
-        },
-    )
-    if not created:
-        update_fields = []
-        if relative_score != link.score:
-            link.score = relative_score
-            update_fields.append("score")
-        if submission.title != link.title:
-            link.title = submission.title
-            update_fields.append("title")
-        if DeepDiff(metadata, link.metadata):
-            link.metadata = metadata
-            update_fields.append("metadata")
-        if update_fields:
-            link.save(update_fields=update_fields)
-    link.feeds.add(feed)
+    known = [all_existing[s].score for s in subreddits if s in all_existing]
+    if not known:
+        known = [s.score for s in all_existing.values()]
+    if not known:
+        known = [s.score for s in submissions]
+    score = max(int(median(known)), 1)
+    logging.info("Using provisional scoring %d for %s", score, missing)
+
+    scorings = [
+        RelativeScoring(
+            id=subreddit,
+            score=score,
+            last_updated=datetime.now(timezone.utc),
+            is_provisional=True,
+        )
+        for subreddit in missing
+    ]
+    RelativeScoringDao.create_provisional(scorings)
+    all_existing.update((s.id, s) for s in scorings)
+
+
+def refresh_link_embeds():
+    logging.info("Refreshing link embeds")
+    count = 0
+    batch_size = settings.EMBED_REFRESH_BATCH
+    while links := LinkDao.get_stale_embeds(EMBED_VERSION, batch_size):
+        for link in links:
+            link.update_embed()
+        LinkDao.update_embeds(links)
+        count += len(links)
+    logging.info("Finished refreshing %d link embeds", count)
 
 
 def get_submission_metadata(data: Mapping) -> Mapping:
@@ -205,29 +352,32 @@ def get_submission_metadata(data: Mapping) -> Mapping:
 
 def refresh_relative_scoring():
     logging.info("Refreshing reddit relative scoring")
-    reddit = get_reddit()
     cutoff = datetime.now(timezone.utc) - settings.REDDIT_SCORING_REFRESH_DELAY
-    for scoring in RelativeScoringDao.get_next_to_refresh(cutoff):
-        build_relative_scoring(reddit, scoring.id).save()
+    limit = settings.REDDIT_SCORING_REFRESH_BATCH
+    stale = {s.id: s for s in RelativeScoringDao.get_next_to_refresh(cutoff, limit)}
+    refreshed = []
+    failed = []
+    for subreddit, future in fetch_concurrently(build_relative_scoring, stale):
+        try:
+            scoring = future.result()
+        except Exception:
+            logging.exception("Error refreshing relative scoring for %s", subreddit)
+            stale[subreddit].failures += 1
+            stale[subreddit].last_updated = datetime.now(timezone.utc)
+            failed.append(stale[subreddit])
+            continue
+        if stale[subreddit].is_provisional:
+            delay = settings.REDDIT_SCORING_REFRESH_DELAY * random.random()
+            scoring.last_updated -= delay
+        refreshed.append(scoring)
+    with transaction.atomic():
+        RelativeScoringDao.lock()
+        RelativeScoringDao.update_scores(refreshed)
+        RelativeScoringDao.update_failures(failed)
+        LinkDao.rescale_scores((stale[s.id], s) for s in refreshed)
     logging.info("Finished refreshing reddit relative scoring")
 
 
-def get_or_create_relative_scoring(
-    all_existing: MutableMapping[str, RelativeScoring], reddit: Reddit, subreddit: str
-) -> RelativeScoring:
-    existing = all_existing.get(subreddit)
-    if existing is not None:
-        return existing
-    scoring = build_relative_scoring(reddit, subreddit)
-    scoring.last_updated = (
-        datetime.now(timezone.utc)
-        - settings.REDDIT_SCORING_REFRESH_DELAY * random.random()
-    )
-    all_existing[subreddit] = scoring
-    scoring.save()
-    return scoring
-
-
 def build_relative_scoring(reddit: Reddit, subreddit: str) -> RelativeScoring:
     logging.info("Building relative scoring for %s", subreddit)
     top = reddit.subreddit(subreddit).top(
@@ -0,0 +1,43 @@
+import logging
+
+from datetime import datetime, timezone
+from django.conf import settings
+from django.db.models import QuerySet
+from typing import Callable, Mapping
+
+from .dao import RetentionDao
+from .models import HnItem, Link, SeenChunk, SeenSubmission
+
+EXPIRED_QUERIES: Mapping[str, Callable[[datetime], QuerySet]] = {
+    "links": lambda cutoff: Link.objects.filter(posted_at__lt=cutoff, is_saved=False),
+    "seen_submissions": lambda cutoff: SeenSubmission.objects.filter(
+        seen_at__lt=cutoff
+    ),
+    "seen_chunks": lambda cutoff: SeenChunk.objects.filter(updated_at__lt=cutoff),
+    "hn_items": lambda cutoff: HnItem.objects.filter(fetched_at__lt=cutoff),
+}
+
+
+def apply_retention() -> None:
+    logging.info("Applying retention")
+    now = datetime.now(timezone.utc)
+    for name, window in settings.RETENTION.items():
+        query = EXPIRED_QUERIES[name](now - window)
+        rows = 0
+        size = 0
+        while True:
+            count, batch_size = RetentionDao.delete_batch(
+                query, settings.RETENTION_BATCH_SIZE
+            )
+            if not count:
+                break
+            rows += count
+            size += batch_size
+        logging.info(
+            "Deleted %d rows (%d bytes) from %s",
+            rows,
+            size,
+            name,
+            extra={"table": name, "rows": rows, "bytes": size},
+        )
+    logging.info("Finished applying retention")
@@ -0,0 +1,103 @@
+from threading import Event, Lock, Thread
+from typing import Dict, Iterable, Optional, Set
+import atexit
+import logging
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, close_old_connections
+
+from .dao import SeenSubmissionDao
+
+
+class SeenBuffer:
+    def __init__(self, flush_interval: float, max_size: int, max_pending: int):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.max_pending = max_pending
+        self.lock = Lock()
+        self.flush_lock = Lock()
+        self.pending: Dict[int, Set[str]] = {}
+        self.size = 0
+        self.flushing = 0
+        self.wake = Event()
+        self.thread: Optional[Thread] = None
+
+    def add(self, user_id: int, ids: Iterable[str]) -> bool:
+        with self.lock:
+            if self.size + self.flushing >= self.max_pending:
+                return False
+            self.merge(user_id, ids)
+            if self.thread is None:
+                self.thread = Thread(target=self.run, daemon=True)
+                self.thread.start()
+            if self.size >= self.max_size:
+                self.wake.set()
+            return True
+
+    def merge(self, user_id: int, ids: Iterable[str]) -> None:
+        user_ids = self.pending.setdefault(user_id, set())
+        before = len(user_ids)
+        user_ids.update(ids)
+        self.size += len(user_ids) - before
+
+    def requeue(self, pending: Dict[int, Set[str]]) -> None:
+        with self.lock:
+            for user_id, ids in pending.items():
+                self.merge(user_id, ids)
+
+    def run(self) -> None:
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logging.exception("Error flushing seen submissions")
+            finally:
+                close_old_connections()
+
+    def flush(self) -> int:
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                size, self.size = self.size, 0
+                self.flushing = size
+            if not pending:
+                return 0
+            try:
+                SeenSubmissionDao.mark_seen_many(pending)
+            except (DataError, IntegrityError):
+                logging.exception("Error flushing seen submissions, retrying per user")
+                size = self.flush_per_user(pending)
+            except Exception:
+                logging.exception("Error flushing seen submissions, requeueing")
+                self.requeue(pending)
+                size = 0
+            finally:
+                with self.lock:
+                    self.flushing = 0
+            logging.info("Flushed %d seen submissions", size, extra={"rows": size})
+            return size
+
+    def flush_per_user(self, pending: Dict[int, Set[str]]) -> int:
+        size = 0
+        for user_id, ids in pending.items():
+            try:
+                SeenSubmissionDao.mark_seen(user_id, ids)
+                size += len(ids)
+            except (DataError, IntegrityError):
+                logging.exception(
+                    "Dropping %d seen submissions for user %s", len(ids), user_id
+                )
+            except Exception:
+                logging.exception("Error flushing seen submissions, requeueing")
+                self.requeue({user_id: ids})
+        return size
+
+
+seen_buffer = SeenBuffer(
+    settings.SEEN_BUFFER_FLUSH_INTERVAL.total_seconds(),
+    settings.SEEN_BUFFER_MAX_SIZE,
+    settings.SEEN_BUFFER_MAX_PENDING,
+)
+atexit.register(seen_buffer.flush)
\ No newline at end of file
@@ -5,8 +5,10 @@ from allauth.socialaccount.signals import pre_social_login
 from allauth.socialaccount.models import SocialLogin
 from django.http.request import HttpRequest
 
+from .cache import invalidate_locations
 from .dao import ProfileDao
 from .data import Token
+from .tokens import invalidate_token
 
 
 def register_signals() -> None:
@@ -26,4 +28,6 @@ def populate_profile(*_, **kwargs):
 
     t = login.token
     token = Token(t.token, t.token_secret, t.expires_at)
-    ProfileDao.write_token(request.user.id, request.raw_username, token)
\ No newline at end of file
+    ProfileDao.write_token(request.user.id, request.raw_username, token)
+    invalidate_token(request.user.id, request.raw_username)
+    invalidate_locations(request.user.id, request.raw_username)
\ No newline at end of file
@@ -1,47 +1,129 @@
 import logging
+import random
 
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
 from django.conf import settings
-from sched import scheduler
-from threading import Lock, Thread
-from time import sleep
+from django.db import close_old_connections, connection
+from django.utils.module_loading import import_string
+from threading import Thread
+from time import sleep, time
+from typing import Callable, Optional, Tuple
 
-from . import hn, reddit
 
+def run_as_leader(run: Callable[[], None]) -> None:
+    poll_seconds = settings.TASK_LEADER_POLL.total_seconds()
+    while not try_leader_lock():
+        logging.info("Another worker holds the task leader lock, waiting")
+        sleep(poll_seconds)
+    logging.info("Acquired task leader lock")
 
-class TaskThread:
-    def __init__(self):
-        self.lock = Lock()
-        self.thread = Thread(target=run_tasks, daemon=True)
-        self.started = False
+    Thread(target=run, daemon=True).start()
+    while True:
+        sleep(poll_seconds)
+        if not holds_leader_lock():
+            raise Exception("Lost task leader lock")
+
+
+def try_leader_lock() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [settings.TASK_LEADER_LOCK])
+        (acquired,) = cursor.fetchone()
+    return acquired
+
+
+def holds_leader_lock() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT EXISTS (
+                SELECT 1 FROM pg_locks
+                WHERE locktype = 'advisory' AND objid = %s AND granted
+                AND pid = pg_backend_pid()
+            )
+            """,
+            [settings.TASK_LEADER_LOCK],
+        )
+        (held,) = cursor.fetchone()
+    return held
 
-    def start_once(self):
-        if not self.started:
-            with self.lock:
-                if not self.started:
-                    self.thread.start()
-                    self.started = True
 
+class ScheduledTask:
+    def __init__(
+        self, name: str, interval: timedelta, jitter: timedelta, warn_after: timedelta
+    ):
+        self.name = name
+        self.func: Callable[[], None] = import_string(name)
+        self.interval = interval.total_seconds()
+        self.jitter = jitter.total_seconds()
+        self.warn_after = warn_after.total_seconds()
+        self.next_run = time() + random.uniform(0, self.jitter)
+        self.started_at = 0.0
+        self.future: Optional[Future] = None
+        self.warned = False
 
-def init_task_thread_middleware(get_response):
-    thread = TaskThread()
+    def start(self, pool: ThreadPoolExecutor) -> None:
+        now = time()
+        drift = now - self.next_run
+        logging.info(
+            "Starting task %s",
+            self.name,
+            extra={"task": self.name, "drift_seconds": drift},
+        )
+        self.started_at = now
+        self.warned = False
+        self.future = pool.submit(run_task, self.func)
 
-    def middleware(request):
-        thread.start_once()
-        return get_response(request)
+    def check(self) -> None:
+        if self.future is None:
+            return
+        now = time()
+        duration = now - self.started_at
+        if not self.future.done():
+            # Threads cannot be interrupted, so a slow task only gets a warning
+            if duration > self.warn_after and not self.warned:
+                self.warned = True
+                logging.error(
+                    "Task %s has been running for longer than %ss",
+                    self.name,
+                    self.warn_after,
+                    extra={"task": self.name, "duration_seconds": duration},
+                )
+            return
 
-    return middleware
+        succeeded, started_at, finished_at = self.future.result()
+        self.future = None
+        duration = finished_at - started_at
+        logging.info(
+            "Finished task %s in %.1fs",
+            self.name,
+            duration,
+            extra={
+                "task": self.name,
+                "duration_seconds": duration,
+                "queued_seconds": started_at - self.started_at,
+                "succeeded": succeeded,
+            },
+        )
+        self.next_run = max(self.next_run + self.interval, now)
+        self.next_run += random.uniform(0, self.jitter)
+
+    def is_due(self) -> bool:
+        return self.future is None and time() >= self.next_run
 
 
 def run_tasks():
     while True:
         try:
             logging.info("Starting task scheduler")
-            sched = scheduler()
-            keep_task_running(hn.sync_top_stories, sched)
-            keep_task_running(reddit.sync_feeds, sched)
-            keep_task_running(reddit.sync_top_submissions, sched)
-            keep_task_running(reddit.refresh_relative_scoring, sched)
-            sched.run()
+            tasks = [ScheduledTask(name, **t) for name, t in settings.TASKS.items()]
+            with ThreadPoolExecutor(max_workers=settings.TASK_WORKERS) as pool:
+                while True:
+                    for task in tasks:
+                        task.check()
+                        if task.is_due():
+                            task.start(pool)
+                    sleep(1)
         except Exception:
             logging.exception("Error running task scheduler")
         finally:
@@ -53,13 +135,14 @@ def run_tasks():
             sleep(delay_seconds)
 
 
-def keep_task_running(task, sched):
-    def run_task():
-        try:
-            task()
-        except Exception:
-            logging.exception("Error running task")
-        finally:
-            sched.enter(settings.TASK_DELAY.total_seconds(), 0, run_task)
-
-    run_task()
+def run_task(task: Callable[[], None]) -> Tuple[bool, float, float]:
+    started_at = time()
+    close_old_connections()
+    try:
+        task()
+        return True, started_at, time()
+    except Exception:
+        logging.exception("Error running task")
+        return False, started_at, time()
+    finally:
+        close_old_connections()
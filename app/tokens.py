@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+from time import monotonic
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple
+from weakref import WeakValueDictionary
+import asyncio
+
+from django.conf import settings
+
+from .data import Token
+from .models import Profile
+from .utils import from_timestamp_utc
+
+
+class TokenCache:
+    def __init__(self):
+        self.lock = Lock()
+        self.tokens: Dict[Hashable, Token] = {}
+        self.refresh_locks: "WeakValueDictionary[Hashable, Lock]" = (
+            WeakValueDictionary()
+        )
+        self.async_refresh_locks: "WeakValueDictionary[Hashable, asyncio.Lock]" = (
+            WeakValueDictionary()
+        )
+
+    def get(self, key: Hashable, token: Token) -> Token:
+        with self.lock:
+            cached = self.tokens.get(key)
+        if cached is None or cached.expires_at <= token.expires_at:
+            return token
+        return cached
+
+    def put(self, key: Hashable, token: Token) -> None:
+        with self.lock:
+            self.tokens[key] = token
+
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            self.tokens.pop(key, None)
+
+    def refresh_lock(self, key: Hashable) -> Lock:
+        with self.lock:
+            return self.refresh_locks.setdefault(key, Lock())
+
+    def async_refresh_lock(self, key: Hashable) -> asyncio.Lock:
+        with self.lock:
+            return self.async_refresh_locks.setdefault(key, asyncio.Lock())
+
+
+class ProfileTokenCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.lock = Lock()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: "OrderedDict[int, Tuple[int, float, Mapping[str, Token]]]" = (
+            OrderedDict()
+        )
+
+    def get(self, user_id: int, version: int) -> Optional[Mapping[str, Token]]:
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, expires_at, tokens = entry
+            if entry_version != version or expires_at < monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return tokens
+
+    def put(self, user_id: int, version: int, tokens: Mapping[str, Token]) -> None:
+        with self.lock:
+            self.entries[user_id] = (version, monotonic() + self.ttl, tokens)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+
+def get_profile_tokens(profile: Profile) -> Mapping[str, Token]:
+    tokens = profile_tokens.get(profile.user_id, profile.version)
+    if tokens is None:
+        tokens = profile.parse_enc_tokens()
+        profile_tokens.put(profile.user_id, profile.version, tokens)
+    return tokens
+
+
+def is_expiring(token: Token) -> bool:
+    margin = settings.REDDIT_TOKEN_REFRESH_MARGIN
+    return token.expires_at - margin <= datetime.now(timezone.utc)
+
+
+# pylint: disable=protected-access
+def apply_token(auth: Any, token: Token) -> None:
+    auth.refresh_token = token.token_secret
+    auth.access_token = token.token
+    auth.scopes = set(settings.REDDIT_SCOPES)
+    auth._expiration_timestamp = token.expires_at.timestamp()
+
+
+def read_token(auth: Any) -> Token:
+    return Token(
+        auth.access_token,
+        auth.refresh_token,
+        from_timestamp_utc(auth._expiration_timestamp),
+    )
+
+
+def get_token_key(user_id: int, username: str) -> Hashable:
+    return (user_id, username)
+
+
+def invalidate_token(user_id: int, username: str) -> None:
+    token_cache.delete(get_token_key(user_id, username))
+
+
+token_cache = TokenCache()
+profile_tokens = ProfileTokenCache(
+    settings.PROFILE_TOKEN_CACHE_SIZE,
+    settings.PROFILE_TOKEN_CACHE_TTL.total_seconds(),
+)
\ No newline at end of file
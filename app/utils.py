@@ -1,19 +1,57 @@
+import asyncio
+import dataclasses
+import hashlib
 import json
+import logging
 
 from base64 import b64decode
 from datetime import datetime, timezone
 from os.path import splitext
-from typing import Any, Iterable, Optional, Type, TypeVar
-
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    TypeVar,
+)
+
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework.renderers import JSONRenderer
 from pydantic.json import pydantic_encoder
 from pydantic.tools import parse_obj_as, parse_raw_as
 from rest_framework.utils import encoders
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 T = TypeVar("T")
 
 
+background_tasks: Set[asyncio.Future] = set()
+
+
+def log_task_exception(task: asyncio.Future) -> None:
+    background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Error in background task", exc_info=task.exception())
+
+
+def spawn(awaitable: Awaitable[Any]) -> None:
+    task = asyncio.ensure_future(awaitable)
+    background_tasks.add(task)
+    task.add_done_callback(log_task_exception)
+
+
 def first(stuff: Iterable[T]) -> Optional[T]:
     return next((t for t in stuff if t), None)
 
@@ -26,6 +64,15 @@ def to_json(thing: Any) -> str:
     return json.dumps(thing, default=pydantic_encoder)
 
 
+def to_obj(thing: Any) -> Any:
+    return json.loads(to_json(thing))
+
+
+def hash_json(thing: Any) -> str:
+    normalized = json.dumps(thing, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
 def from_raw(type_: Type[T], raw: str) -> T:
     return parse_raw_as(type_, raw)
 
@@ -38,6 +85,18 @@ def from_timestamp_utc(timestamp: float) -> datetime:
     return datetime.fromtimestamp(timestamp, timezone.utc)
 
 
+def conditional_response(
+    request: HttpRequest, etag: str, render: Callable[[], HttpResponse]
+) -> HttpResponse:
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render()
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
+
+
 def b64_to_hex(b64_str: str) -> str:
     return b64decode(b64_str).hex()
 
@@ -52,5 +111,57 @@ class RestPydanticJSONEncoder(encoders.JSONEncoder, PydanticJSONEncoder):
     pass
 
 
+PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+DATACLASS_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def get_dataclass_fields(cls: type) -> Optional[Tuple[str, ...]]:
+    fields = DATACLASS_FIELDS.get(cls)
+    if fields is None and dataclasses.is_dataclass(cls):
+        fields = tuple(f.name for f in dataclasses.fields(cls))
+        DATACLASS_FIELDS[cls] = fields
+    return fields
+
+
+def to_primitive(thing: Any) -> Any:
+    if isinstance(thing, PRIMITIVE_TYPES):
+        return thing
+    if isinstance(thing, (list, tuple)):
+        return [to_primitive(t) for t in thing]
+    if isinstance(thing, dict):
+        return {k: to_primitive(v) for k, v in thing.items()}
+    fields = get_dataclass_fields(type(thing))
+    if fields is None:
+        return thing
+    return {name: to_primitive(getattr(thing, name)) for name in fields}
+
+
+json_default = RestPydanticJSONEncoder().default
+
+
+def dump_json(thing: Any) -> bytes:
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        ret = orjson.dumps(thing, default=json_default, option=option)
+    else:
+        ret = json.dumps(
+            to_primitive(thing),
+            cls=RestPydanticJSONEncoder,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode()
+    # Escaped like DRF's JSONRenderer, so output is safe inside <script> tags
+    if b"\xe2" in ret:
+        ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+        ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+    return ret
+
+
 class PydanticJSONRenderer(JSONRenderer):
-    encoder_class = RestPydanticJSONEncoder
\ No newline at end of file
+    encoder_class = RestPydanticJSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if data is None or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dump_json(data)
\ No newline at end of file
@@ -1,6 +1,18 @@
-wsgi_app = "project.wsgi"
+import os
+
 bind = ["127.0.0.1:8001"]
-threads = 10
+
+if os.environ.get("NS_ASGI") == "1":
+    wsgi_app = "project.asgi:application"
+    worker_class = "project.workers.AutoUvicornWorker"
+    # Django runs sync views and ORM calls on a single thread per ASGI process,
+    # so DB-bound endpoints only get as much concurrency as there are workers.
+    # Each worker also has its own caches, seen buffer and token refreshes, and
+    # costs a full process of memory instead of a thread.
+    workers = int(os.environ.get("NS_ASGI_WORKERS", 10))
+else:
+    wsgi_app = "project.wsgi"
+    threads = 10
 
 access_log_format = "%(m)s %(U)s %(s)s"
 
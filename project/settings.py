@@ -20,12 +20,82 @@ REDDIT_USERNAME = environ["NS_REDDIT_USERNAME"]
 REDDIT_PASSWORD = environ["NS_REDDIT_PASSWORD"]
 
 TASK_DELAY = timedelta(minutes=60)
+TASK_WORKERS = 3
+TASKS = {
+    "app.hn.sync_top_stories": dict(
+        interval=timedelta(minutes=15),
+        jitter=timedelta(minutes=1),
+        warn_after=timedelta(minutes=10),
+    ),
+    "app.reddit.sync_feeds": dict(
+        interval=timedelta(minutes=60),
+        jitter=timedelta(minutes=5),
+        warn_after=timedelta(minutes=5),
+    ),
+    "app.reddit.sync_top_submissions": dict(
+        interval=timedelta(minutes=60),
+        jitter=timedelta(minutes=5),
+        warn_after=timedelta(minutes=30),
+    ),
+    "app.reddit.refresh_relative_scoring": dict(
+        interval=timedelta(minutes=10),
+        jitter=timedelta(minutes=1),
+        warn_after=timedelta(minutes=10),
+    ),
+    "app.reddit.refresh_link_embeds": dict(
+        interval=timedelta(minutes=60),
+        jitter=timedelta(minutes=5),
+        warn_after=timedelta(minutes=30),
+    ),
+    "app.retention.apply_retention": dict(
+        interval=timedelta(days=1),
+        jitter=timedelta(minutes=30),
+        warn_after=timedelta(hours=2),
+    ),
+}
+TASK_LEADER_LOCK = 7164823
+TASK_LEADER_POLL = timedelta(seconds=30)
 HN_TOP_STORIES = 30
+HN_FETCH_WORKERS = 16
+HN_FETCH_TIMEOUT = 10
+HN_FETCH_RETRIES = 3
+HN_INCREMENTAL_SYNC = True
+HN_ITEM_REFRESH_DELAY = timedelta(hours=6)
 REDDIT_TOP_SUBMISSIONS = 100
+REDDIT_SYNC_WORKERS = 8
 REDDIT_SCORING_TOP_TIME = "month"
 REDDIT_SCORING_TOP_LIMIT = 10
 REDDIT_SCORING_REFRESH_DELAY = timedelta(days=1)
+REDDIT_SCORING_REFRESH_BATCH = 50
+REDDIT_SCORING_LOCK = 7164824
+REDDIT_STORE_RAW_METADATA = False
+EMBED_REFRESH_BATCH = 1000
+RETENTION = {
+    "links": timedelta(days=180),
+    "seen_submissions": timedelta(days=365),
+    "seen_chunks": timedelta(days=365),
+    "hn_items": timedelta(days=7),
+}
+RETENTION_BATCH_SIZE = 5000
 REDDIT_SCOPES = ["identity", "mysubreddits", "read"]
+REDDIT_TOKEN_REFRESH_MARGIN = timedelta(seconds=30)
+PROFILE_TOKEN_CACHE_SIZE = 1000
+PROFILE_TOKEN_CACHE_TTL = timedelta(minutes=5)
+REDDIT_CLIENT_POOL_SIZE = 100
+REDDIT_CLIENT_IDLE_TIMEOUT = timedelta(minutes=10)
+LISTING_CACHE_TTL = timedelta(seconds=30)
+LOCATIONS_CACHE_REFRESH = timedelta(minutes=10)
+LOCATIONS_CACHE_TTL = timedelta(days=1)
+LOCATIONS_REFRESH_WORKERS = 2
+SEEN_SUBMISSION_STORE = "table"
+UNSEEN_MAX_PAGES = 5
+UNSEEN_PREFETCH_WORKERS = 2
+SEEN_WRITE_BEHIND = True
+SEEN_BUFFER_FLUSH_INTERVAL = timedelta(seconds=2)
+SEEN_BUFFER_MAX_SIZE = 5000
+SEEN_BUFFER_MAX_PENDING = 100000
+SEEN_INSERT_BATCH_SIZE = 1000
+ASYNC_REDDIT_VIEWS = environ.get("NS_ASGI") == "1"
 
 DEBUG = False
 ALLOWED_HOSTS = ["squidscroll.com"]
@@ -105,8 +175,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    "app.tasks.init_task_thread_middleware",
     "django.middleware.security.SecurityMiddleware",
+    "app.middleware.JsonGZipMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -146,6 +216,22 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "listings": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "listings",
+        "OPTIONS": {"MAX_ENTRIES": 1000},
+    },
+    "locations": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "locations",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -5,10 +5,16 @@ from django.urls import include, path
 
 from app.api import router
 
+api_urlpatterns = router.urls
+if settings.ASYNC_REDDIT_VIEWS:
+    from app import async_api
+
+    api_urlpatterns = async_api.urlpatterns + api_urlpatterns
+
 svc_urlpatterns = [
     path("accounts/", include("allauth.urls")),
     path("admin/", admin.site.urls),
-    path("api/", include(router.urls)),
+    path("api/", include(api_urlpatterns)),
     path("api-auth/", include("rest_framework.urls", namespace="rest_framework")),
 ]
 
@@ -22,4 +28,4 @@ if settings.DEBUG:
 urlpatterns = [
     path("", lambda _: redirect("admin:index")),
     path("svc/", include(svc_urlpatterns)),
-]
\ No newline at end of file
+]
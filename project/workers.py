@@ -0,0 +1,6 @@
+from uvicorn.workers import UvicornWorker
+
+
+# UvicornWorker hardcodes uvloop and httptools, which are not installed
+class AutoUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": "auto", "http": "auto"}
@@ -14,6 +14,8 @@ export class ScrollHandler {
   private is_resizing: boolean = false
 
   private read_ids = new Set<string>()
+  private sent_ids = new Set<string>()
+  private is_marking_read = false
 
   private next?: string = null
   private after?: string = null
@@ -71,11 +73,20 @@ export class ScrollHandler {
 
   async mark_as_read(is_authenticated: boolean): Promise<void> {
     const ids = Array.from(this.read_ids)
-    if (ids.length > 0) {
+    if (ids.length === 0 || this.is_marking_read) {
+      return
+    }
+    this.is_marking_read = true
+    try {
       if (is_authenticated && this.load_id.sort_method.name === "curated") {
         await this.service_client.put("/svc/api/submissions/mark_seen/", { ids })
       }
-      ids.forEach((id) => this.read_ids.delete(id))
+      ids.forEach((id) => {
+        this.read_ids.delete(id)
+        this.sent_ids.add(id)
+      })
+    } finally {
+      this.is_marking_read = false
     }
   }
 
@@ -93,7 +104,9 @@ export class ScrollHandler {
         if (element.dataset.loadMore === "true" && this.is_more_results) {
           this.load_more()
         }
-      } else if (entry.boundingClientRect.top < 0) {
+      } else if (
+        entry.boundingClientRect.top < 0 && !this.sent_ids.has(reddit_id)
+      ) {
         this.read_ids.add(reddit_id)
       }
     })
@@ -147,8 +160,7 @@ export class ScrollHandler {
     }
 
     const response = await (await this.service_client.get(url)).json()
-    const last = response.results[response.results.length - 1]
-    this.after = last?.id
+    this.after = response.after
     this.next = response.next
     this.is_more_results =
       (this.after != null && !this.load_id.search.includes("reddit_ids=")) ||